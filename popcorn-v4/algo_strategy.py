@@ -4,7 +4,6 @@ import random
 import math
 import warnings
 from sys import maxsize
-import json
 import copy
 from gamelib import game_state
 import time
@@ -103,7 +102,10 @@ class AlgoStrategy(gamelib.AlgoCore):
         game engine.
         """
         game_state = gamelib.GameState(self.config, turn_state)
-        gamelib.debug_write('Performing turn {} of your custom algo strategy'.format(game_state.turn_number))
+        precomputed = self.collect_background()
+        if precomputed is not None:
+            game_state.reuse_caches(precomputed)
+        gamelib.log.info('Performing turn {} of your custom algo strategy', game_state.turn_number)
         game_state.suppress_warnings(True)  #Comment or remove this line to enable warnings.
         self.funnel_location(game_state)
         self.starter_strategy(game_state)
@@ -387,7 +389,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
             return None
 
-        best = simulator.simulate_multiple(game_state, strats, {}, new_opt)
+        best = simulator.simulate_multiple(game_state, strats, {}, new_opt, self.turn_deadline.slice())
 
         if not best:
 
@@ -522,7 +524,7 @@ class AlgoStrategy(gamelib.AlgoCore):
 
         random.shuffle(strats)
 
-        best = simulator.simulate_multiple(game_state, strats, {}, new_opt)
+        best = simulator.simulate_multiple(game_state, strats, {}, new_opt, self.turn_deadline.slice())
 
         if not best:
 
@@ -539,17 +541,20 @@ class AlgoStrategy(gamelib.AlgoCore):
         ran = random.randint(0, 100)
         if game_state.get_resource(1, 1) > 12 and self.enemy_spawn_side != 0 and ran > 50:
             self.self_destruct(self.is_left, game_state)
-        game_state.attempt_spawn(WALL, self.additional_walls)
+        UPGRADE = game_state.UPGRADE
+        game_state.attempt_build(
+            [(WALL, location) for location in self.additional_walls] +
+            [(UPGRADE, location) for location in self.key_wall_upgrades] +
+            [(TURRET, location) for location in self.additional_turrets] +
+            [(UPGRADE, location) for location in self.additional_wall_upgrades + self.initial_turret_locations + self.additional_turrets],
+            stop_when_unaffordable=False)
         self.recreate(game_state, self.additional_walls)
-        game_state.attempt_upgrade(self.key_wall_upgrades)
-        game_state.attempt_spawn(TURRET, self.additional_turrets)
         self.recreate(game_state, self.additional_turrets)
-        game_state.attempt_upgrade(self.additional_wall_upgrades)
-        game_state.attempt_upgrade(self.initial_turret_locations)
-        game_state.attempt_upgrade(self.additional_turrets)
         if game_state.get_resource(0) > 8:
-            game_state.attempt_spawn(SUPPORT, self.additional_support_locations)
-            game_state.attempt_upgrade(self.additional_support_locations)
+            game_state.attempt_build(
+                [(SUPPORT, location) for location in self.additional_support_locations] +
+                [(UPGRADE, location) for location in self.additional_support_locations],
+                stop_when_unaffordable=False)
         
     def funnel_location(self, game_state):
         right_start = game_state.find_path_to_edge([16, 25])
@@ -575,18 +580,18 @@ class AlgoStrategy(gamelib.AlgoCore):
         if self.enemy_support_count > 5:
             spawn = 2
         if self.is_left and self.enemy_spawn_side > 0:
-            gamelib.debug_write(1)
+            gamelib.log.debug("self destruct case {}", 1)
             self.is_far_away = False
         if not self.is_left and self.enemy_spawn_side > 0:
-            gamelib.debug_write(2)
+            gamelib.log.debug("self destruct case {}", 2)
 
             self.is_far_away = True
         if self.is_left and self.enemy_spawn_side < 0:
-            gamelib.debug_write(3)
+            gamelib.log.debug("self destruct case {}", 3)
 
             self.is_far_away = True
         if not self.is_left and self.enemy_spawn_side < 0:
-            gamelib.debug_write(4)
+            gamelib.log.debug("self destruct case {}", 4)
 
             self.is_far_away = False
         if is_left:
@@ -633,7 +638,28 @@ class AlgoStrategy(gamelib.AlgoCore):
             game_state.attempt_spawn(WALL, [[i, 5] for i in range(10, 18)])
 
 
-    def on_action_frame(self, turn_string):
+    def on_action_phase_settled(self, frame_state):
+        self.start_background(self.precompute_turn, frame_state)
+
+    def precompute_turn(self, task, frame_state):
+        """
+        Warms the pathfinding caches for the paths funnel_location and the attacks look up,
+        on the structures left once the action phase has settled. Runs in the background.
+        """
+        game_state = gamelib.GameState(self.config, frame_state)
+        game_state.get_path_finder()
+        for location in [[16, 25], [11, 25]]:
+            if task.cancelled():
+                return None
+            game_state.find_path_to_edge(location)
+        if task.cancelled():
+            return None
+        game_state.find_paths_to_edges()
+        return game_state
+
+    action_frame_sections = ("events.spawn", "events.breach", "events.selfDestruct", "p2Units")
+
+    def on_action_frame(self, state):
         """
         This is the action frame of the game. This function could be called 
         hundreds of times per turn and could slow the algo down so avoid putting slow code here.
@@ -641,7 +667,6 @@ class AlgoStrategy(gamelib.AlgoCore):
         Full doc on format of a game frame at in json-docs.html in the root of the Starterkit.
         """
         # Let's record at what position we get scored on
-        state = json.loads(turn_string)
         events = state["events"]
         spawns = events["spawn"]
         breaches = events["breach"]
@@ -666,7 +691,7 @@ class AlgoStrategy(gamelib.AlgoCore):
             # When parsing the frame data directly, 
             # 1 is integer for yourself, 2 is opponent (StarterKit code uses 0, 1 as player_index instead)
             if not unit_owner_self:
-                gamelib.debug_write("Got scored on at: {}".format(location))
+                gamelib.log.info("Got scored on at: {}", location)
 
                 if(location[0] <= 13): #left
                     self.scored_on_side.add(1)
@@ -16,14 +16,32 @@ Investigating it is useful for advanced players interested in getting data from
 The Navigation class in navigation.py contains functions related to pathfinding, which are used by GameState in pathing related functions. 
 Investigating it is useful for advanced player who want to optimize the slow default pathing algorithm we provide. \n 
 
+coverage.py records which structures reach each tile, used by GameState to profile how exposed a path is. \n
+
+bitboard.py stores sets of tiles as single integers, for fast flood fills, reachability checks and range coverage. \n
+
+board.py mirrors the structures on a GameMap as flat arrays of type, owner, health and upgrade state. \n
+
+serialization.py encodes a GameState as a few KB of bytes, for sending it to another process or caching it. \n
+
+budget.py splits the time of each turn between the parts of an algo, keeping turns under the engine's soft time limit. \n
+
+background.py runs work on a background thread while the algo waits for the game engine, see AlgoCore.start_background. \n
+
+logger.py is a leveled debug log, gamelib.log, that buffers messages until the end of the turn and keeps recent detail for crash reports. \n
+
+workers.py keeps a pool of worker processes, started before turn 0, that evaluate work in parallel against the current turn's state, see AlgoCore.worker_count. \n
+
 util.py contains a small handful of functions that help with communication, including the debug-printing function, debug_write().
 """
 
 from .algocore import AlgoCore
 from .util import debug_write
+from .logger import log
 from .game_state import GameState
 from .unit import GameUnit
 from .game_map import GameMap
+from .budget import TimeSlice, TurnDeadline, TurnBudget
 
-__all__ = ["algocore", "game_state", "game_map", "navigation", "unit", "util"]
+__all__ = ["algocore", "background", "bitboard", "board", "budget", "coverage", "game_state", "game_map", "logger", "navigation", "serialization", "unit", "util", "workers"]
  
\ No newline at end of file
@@ -1,8 +1,115 @@
 import json
+import re
 
+from .background import BackgroundTask
+from .budget import TurnBudget
+from .logger import log
+from .workers import WorkerPool
 from .game_state import GameState
 from .util import get_command, debug_write, BANNER_TEXT, send_command
 
+_TURN_INFO = re.compile(r'"turnInfo"\s*:\s*\[\s*(-?\d+)')
+_DECODER = json.JSONDecoder()
+
+
+_KEY = re.compile(r'"([^"]*)"\s*:\s*')
+_KEY_END = re.compile(r'\s*:\s*')
+
+
+def _object_spans(message):
+    # The [start, end] of every object in message, from the braces outside strings. Without escapes
+    # quotes alternate between opening and closing, so a brace is inside a string when an odd number
+    # of quotes come before it. None if message has escapes
+    if "\\" in message:
+        return None
+    spans = []
+    open_spans = []
+    quotes = 0
+    counted = 0
+    next_open = message.find("{")
+    next_close = message.find("}")
+    while next_open != -1 or next_close != -1:
+        opening = next_close == -1 or (next_open != -1 and next_open < next_close)
+        if opening:
+            position = next_open
+            next_open = message.find("{", position + 1)
+        else:
+            position = next_close
+            next_close = message.find("}", position + 1)
+        quotes += message.count('"', counted, position)
+        counted = position
+        if quotes % 2:
+            continue
+        if opening:
+            open_spans.append(len(spans))
+            spans.append([position, None])
+        else:
+            spans[open_spans.pop()][1] = position
+    return spans
+
+
+def _directly_inside(position, span, spans):
+    # True if position is inside span and not inside an object nested in it
+    start, end = span
+    return start < position < end and not any(start < inner[0] < position < inner[1] < end for inner in spans)
+
+
+def _find_key(message, key, span, spans):
+    # Where the value of key starts in the object at span, or -1. Without escapes a quoted word
+    # followed by a colon can only be a key, the word cannot be json outside a string
+    quoted = '"{}"'.format(key)
+    position = message.find(quoted, span[0], span[1])
+    while position != -1:
+        match = _KEY_END.match(message, position + len(quoted))
+        if match and _directly_inside(position, span, spans):
+            return match.end()
+        position = message.find(quoted, position + 1, span[1])
+    return -1
+
+
+def _object_at(start, spans):
+    for span in spans:
+        if span[0] == start:
+            return span
+    return None
+
+
+def _section(message, spans, key, parent=None):
+    span = spans[0]
+    if parent is not None:
+        span = _object_at(_find_key(message, parent, span, spans), spans)
+        if span is None:
+            return None
+    start = _find_key(message, key, span, spans)
+    if start == -1:
+        return None
+    return _DECODER.raw_decode(message, start)[0]
+
+
+def decode_section(message, key, parent=None):
+    """Decodes a single value of a game state message without decoding the rest
+
+    Args:
+        message: The json string sent by the engine
+        key: The key of the value, such as "p2Units" or the event type "breach"
+        parent: The top level key of the object holding key, such as "events", or None for a top level key
+
+    Returns:
+        The decoded value, or None if the key is not in the message
+
+    """
+    spans = _object_spans(message)
+    if spans is None:
+        # Escaped characters could hide braces or quotes, fall back to decoding everything
+        state = json.loads(message)
+        if parent is not None:
+            state = state.get(parent)
+        return state.get(key) if isinstance(state, dict) else None
+    if not spans:
+        return None
+    return _section(message, spans, key, parent)
+
+
 class AlgoCore(object):
     """
     This class handles communication with the game engine. \n
@@ -10,10 +117,28 @@ class AlgoCore(object):
 
     Attributes :
         * config (JSON): json object containing information about the game
+        * action_frame_sections (tuple): The parts of each action frame on_action_frame needs, such as
+          ("events.breach", "events.selfDestruct", "p2Units"). Only those and turnInfo are decoded.
+          None, the default, decodes whole frames
+        * turn_budget (TurnBudget): Sets the deadline of each turn from the times the engine reports
+        * turn_deadline (TurnDeadline): The deadline of the current turn, opened just before on_turn is called.
+          Ask it for a slice before long running work, see TurnDeadline.slice
+        * worker_count (int): How many worker processes to start when the config arrives, before on_game_start.
+          0, the default, starts none
+        * worker_imports (tuple): Names of modules the workers import while starting, such as ("simulator",)
+        * workers (WorkerPool): The started workers, or None. Send them each turn's state with workers.update
 
     """
+    action_frame_sections = None
+    worker_count = 0
+    worker_imports = ()
+
     def __init__(self):
         self.config = None
+        self._background_task = None
+        self.turn_budget = TurnBudget()
+        self.turn_deadline = None
+        self.workers = None
 
     def on_game_start(self, config):
         """
@@ -26,7 +151,8 @@ class AlgoCore(object):
     def on_turn(self, game_state):
         """
         This step function is called at the start of each turn.
-        It is passed the current game state, which can be used to initiate a new GameState object. 
+        Messages written to gamelib.log during the turn are written once it returns.
+        It is passed the current game state, already decoded from json, which can be used to initiate a new GameState object. 
         By default, it sends empty commands to the game engine. \n
         algo_strategy.py inherits from AlgoCore and overrides this on turn function. 
         Adjusting the on_turn function in algo_strategy is the main way to adjust your algo's logic. 
@@ -38,11 +164,89 @@ class AlgoCore(object):
         """
         After each deploy phase, the game engine will run the action phase of the round.
         The action phase is made up of a sequence of distinct frames. 
-        Each of these frames is sent to the algo in order. 
+        Each of these frames is sent to the algo in order, already decoded from json. 
         They can be handled in this function. 
+        Set action_frame_sections to only decode the parts of each frame you use.
         """
         pass
 
+    def on_action_phase_settled(self, frame_state):
+        """
+        Called once per action phase, on the first frame with no mobile units left on the board.
+        From then on structures can only change through removals, so this is a good place to start
+        preparing the next turn with start_background while the engine finishes the action phase.
+        frame_state is the decoded json of that frame.
+        """
+        pass
+
+    def start_background(self, function, *args):
+        """
+        Runs function(task, *args) on a background thread, cancelling any work started earlier.
+        Collect the result in on_turn with collect_background.
+        """
+        if self._background_task is not None:
+            self._background_task.cancel()
+        self._background_task = BackgroundTask(function, *args)
+        return self._background_task
+
+    def collect_background(self, timeout=0):
+        """
+        Returns the result of the work started with start_background, waiting at most timeout seconds.
+        If it has not finished it is cancelled and None is returned.
+        """
+        task = self._background_task
+        self._background_task = None
+        if task is None:
+            return None
+        result = task.result(timeout)
+        if result is None:
+            task.cancel()
+        return result
+
+    def _decode_frame(self, frame_string):
+        spans = None if self.action_frame_sections is None else _object_spans(frame_string)
+        if not spans:
+            return json.loads(frame_string)
+        frame = {"turnInfo": _section(frame_string, spans, "turnInfo")}
+        for section in self.action_frame_sections:
+            parent, _, key = section.rpartition(".")
+            if parent:
+                frame.setdefault(parent, {})[key] = _section(frame_string, spans, key, parent)
+            else:
+                frame[key] = _section(frame_string, spans, key)
+        return frame
+
+    def _frame_settled(self, frame, frame_string):
+        # No mobile units left for either player, they are unit types 3 to 5.
+        # Unit lists decoded here are kept on frame, so completing it later does not decode them again.
+        # A frame without a player's unit list has no units of that player.
+        for units in ("p1Units", "p2Units"):
+            if frame.get(units) is None:
+                unit_lists = decode_section(frame_string, units)
+                if unit_lists is None:
+                    continue
+                frame[units] = unit_lists
+            if any(frame[units][3:6]):
+                return False
+        return True
+
+    def _complete_frame(self, frame, frame_string):
+        # Decodes the sections of a selectively decoded frame that are still missing, reusing the rest
+        spans = _object_spans(frame_string)
+        if not spans:
+            return json.loads(frame_string)
+        for match in _KEY.finditer(frame_string, spans[0][0], spans[0][1]):
+            key, start = match.group(1), match.end()
+            if not _directly_inside(match.start(), spans[0], spans) or frame_string.count('"', 0, match.start()) % 2:
+                continue
+            inner = _object_at(start, spans)
+            if key not in frame:
+                frame[key] = _DECODER.raw_decode(frame_string, start)[0]
+            elif inner is not None and isinstance(frame[key], dict):
+                for inner_match in _KEY.finditer(frame_string, inner[0], inner[1]):
+                    if inner_match.group(1) not in frame[key] and _directly_inside(inner_match.start(), inner, spans) and frame_string.count('"', 0, inner_match.start()) % 2 == 0:
+                        frame[key][inner_match.group(1)] = _DECODER.raw_decode(frame_string, inner_match.end())[0]
+        return frame
 
     def start(self):
         """ 
@@ -53,6 +257,7 @@ class AlgoCore(object):
         """
         debug_write(BANNER_TEXT)
 
+        settled = False
         while True:
             # Note: Python blocks and hangs on stdin. Can cause issues if connections aren't setup properly and may need to
             # manually kill this Python program.
@@ -62,26 +267,51 @@ class AlgoCore(object):
                 This means this must be the config file. So, load in the config file as a json and add it to your AlgoStrategy class.
                 """
                 parsed_config = json.loads(game_state_string)
+                self.turn_budget = TurnBudget(parsed_config)
+                if self.worker_count and self.workers is None:
+                    self.workers = WorkerPool(parsed_config, self.worker_count, self.worker_imports)
                 self.on_game_start(parsed_config)
             elif "turnInfo" in game_state_string:
-                state = json.loads(game_state_string)
-                stateType = int(state.get("turnInfo")[0])
+                # Only the state type is read here, each branch decodes what it needs once
+                stateType = int(_TURN_INFO.search(game_state_string).group(1))
                 if stateType == 0:
                     """
                     This is the game turn game state message. Algo must now print to stdout 2 lines, one for build phase one for
                     deploy phase. Printing is handled by the provided functions.
                     """
-                    self.on_turn(game_state_string)
+                    settled = False
+                    turn_state = json.loads(game_state_string)
+                    self.turn_deadline = self.turn_budget.start_turn(float(turn_state["p1Stats"][3]))
+                    try:
+                        self.on_turn(turn_state)
+                    except Exception as error:
+                        # Write what led up to the crash, the traceback follows when the exception leaves start
+                        log.flush()
+                        log.dump_recent(repr(error))
+                        raise
+                    self.turn_budget.end_turn()
+                    log.flush()
                 elif stateType == 1:
                     """
                     If stateType == 1, this game_state_string string represents a single frame of an action phase
                     """
-                    self.on_action_frame(game_state_string)
+                    frame = self._decode_frame(game_state_string)
+                    self.on_action_frame(frame)
+                    # Checking for the settled frame needs the unit lists, skip it unless a strategy uses it
+                    if not settled and type(self).on_action_phase_settled is not AlgoCore.on_action_phase_settled and self._frame_settled(frame, game_state_string):
+                        settled = True
+                        self.on_action_phase_settled(frame if self.action_frame_sections is None else self._complete_frame(frame, game_state_string))
                 elif stateType == 2:
                     """
                     This is the end game message. This means the game is over so break and finish the program.
                     """
+                    log.flush()
                     debug_write("Got end state, game over. Stopping algo.")
+                    if self._background_task is not None:
+                        self._background_task.cancel()
+                    if self.workers is not None:
+                        self.workers.close()
+                        self.workers = None
                     break
                 else:
                     """
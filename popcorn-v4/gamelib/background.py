@@ -0,0 +1,72 @@
+"""
+Runs work on a background thread while the algo is waiting on the game engine.
+
+During the action phase the main thread spends most of its time blocked reading frames
+from stdin, so a background thread can prepare the next turn almost for free. See
+AlgoCore.start_background and AlgoCore.on_action_phase_settled.
+"""
+
+import threading
+
+from .util import debug_write
+
+
+class BackgroundTask:
+    """A function running on a daemon thread, whose result can be collected later or abandoned
+
+    The function is called with the task as its first argument and should check task.cancelled()
+    between steps, so cancel() stops it early.
+
+    Attributes :
+        * error (Exception): The exception the function raised, or None
+
+    """
+    def __init__(self, function, *args):
+        """Starts running function(task, *args) in the background
+
+        Args:
+            function: The work to run
+            args: Extra arguments passed to function
+
+        """
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+        self._result = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, args=(function, args), daemon=True)
+        self._thread.start()
+
+    def _run(self, function, args):
+        try:
+            self._result = function(self, *args)
+        except Exception as error:
+            self.error = error
+            debug_write("Background task failed: {}".format(repr(error)))
+        finally:
+            self._done.set()
+
+    def cancel(self):
+        """Asks the task to stop, its result will not be returned"""
+        self._cancelled.set()
+
+    def cancelled(self):
+        """True once cancel has been called"""
+        return self._cancelled.is_set()
+
+    def done(self):
+        """True once the function has returned or raised"""
+        return self._done.is_set()
+
+    def result(self, timeout=0):
+        """Gets the value the function returned
+
+        Args:
+            timeout: How many seconds to wait for the function to finish
+
+        Returns:
+            The result, or None if the task is still running, was cancelled or failed
+
+        """
+        if not self._done.wait(timeout) or self.cancelled() or self.error is not None:
+            return None
+        return self._result
@@ -0,0 +1,215 @@
+"""
+Bitboard helpers for the diamond arena.
+
+A set of tiles is stored as a single python int with bit x * ARENA_SIZE + y set for every
+tile [x, y] in the set, the same layout as GameMap.blocked_mask and GameMap.structure_masks.
+Moving a whole set one step in any direction is a shift and a mask, so flood fills and
+reachability questions take a handful of big int operations per step instead of a python
+loop over every tile.
+"""
+
+from .game_map import ARENA_SIZE, HALF_ARENA, ALL_LOCATIONS, BOTTOM_HALF_LOCATIONS, locations_in_range
+
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+
+def bit(location):
+    """Gets the single bit representing a location
+
+    Args:
+        location: An [x, y] location
+
+    Returns:
+        An int with only the bit for location set
+
+    """
+    return 1 << (location[0] * ARENA_SIZE + location[1])
+
+
+def mask_from_locations(locations):
+    """Builds a mask from a list of locations
+
+    Args:
+        locations: A list of [x, y] locations
+
+    Returns:
+        An int with the bit of every location set
+
+    """
+    mask = 0
+    for x, y in locations:
+        mask |= 1 << (x * ARENA_SIZE + y)
+    return mask
+
+
+def locations_from_mask(mask):
+    """Lists the locations in a mask
+
+    Args:
+        mask: A set of tiles
+
+    Returns:
+        A list of [x, y] locations, ordered by x then y
+
+    """
+    locations = []
+    while mask:
+        low = mask & -mask
+        mask ^= low
+        locations.append(list(divmod(low.bit_length() - 1, ARENA_SIZE)))
+    return locations
+
+
+def count(mask):
+    """The number of tiles in a mask"""
+    return bin(mask).count("1")
+
+
+ARENA_MASK = mask_from_locations(ALL_LOCATIONS)
+
+# Masks for tiles that have a neighbor in each direction without wrapping into the next column
+_HAS_UP = 0
+_HAS_DOWN = 0
+for _x in range(ARENA_SIZE):
+    for _y in range(ARENA_SIZE):
+        if _y < ARENA_SIZE - 1:
+            _HAS_UP |= 1 << (_x * ARENA_SIZE + _y)
+        if _y > 0:
+            _HAS_DOWN |= 1 << (_x * ARENA_SIZE + _y)
+
+EDGE_MASKS = [
+    mask_from_locations([[HALF_ARENA + n, ARENA_SIZE - 1 - n] for n in range(HALF_ARENA)]),
+    mask_from_locations([[HALF_ARENA - 1 - n, ARENA_SIZE - 1 - n] for n in range(HALF_ARENA)]),
+    mask_from_locations([[HALF_ARENA - 1 - n, n] for n in range(HALF_ARENA)]),
+    mask_from_locations([[HALF_ARENA + n, n] for n in range(HALF_ARENA)])]
+
+BOTTOM_HALF_MASK = mask_from_locations(BOTTOM_HALF_LOCATIONS)
+TOP_HALF_MASK = ARENA_MASK & ~BOTTOM_HALF_MASK
+
+
+def region_mask(x_min, x_max, y_min=0, y_max=ARENA_SIZE - 1):
+    """Gets the in bounds tiles inside a rectangle, for use with GameMap.get_structures and count_structures
+
+    Args:
+        x_min: The smallest x, inclusive
+        x_max: The largest x, inclusive
+        y_min: The smallest y, inclusive
+        y_max: The largest y, inclusive
+
+    Returns:
+        The set of arena tiles with x_min <= x <= x_max and y_min <= y <= y_max
+
+    """
+    mask = 0
+    for x, y in ALL_LOCATIONS:
+        if x_min <= x <= x_max and y_min <= y <= y_max:
+            mask |= 1 << (x * ARENA_SIZE + y)
+    return mask
+
+
+def expand(mask):
+    """Grows a set of tiles by one step in each of the four directions, clipped to the arena
+
+    Args:
+        mask: A set of tiles
+
+    Returns:
+        The tiles in mask plus every in bounds tile adjacent to one of them
+
+    """
+    return (mask | ((mask & _HAS_UP) << 1) | ((mask & _HAS_DOWN) >> 1) |
+            (mask << ARENA_SIZE) | (mask >> ARENA_SIZE)) & ARENA_MASK
+
+
+def flood_fill(seed, open_mask, stop_mask=0):
+    """Finds every tile connected to seed through open tiles
+
+    Args:
+        seed: The set of tiles to start from
+        open_mask: The tiles that can be walked through
+        stop_mask: If any tile of stop_mask is reached the fill returns early
+
+    Returns:
+        The connected tiles reached so far. Tiles of seed that are not open are dropped.
+
+    """
+    filled = seed & open_mask
+    while True:
+        grown = expand(filled) & open_mask
+        if grown == filled or grown & stop_mask:
+            return grown
+        filled = grown
+
+
+def pocket(location, blocked_mask):
+    """Gets the pocket of pathable space a location belongs to
+
+    Args:
+        location: An [x, y] location
+        blocked_mask: The blocked tiles, see GameMap.blocked_mask
+
+    Returns:
+        The set of tiles reachable from location, empty if location itself is blocked
+
+    """
+    return flood_fill(bit(location), ARENA_MASK & ~blocked_mask)
+
+
+def can_reach_edge(location, target_edge, blocked_mask):
+    """Checks if a unit at location can reach an edge
+
+    Args:
+        location: An [x, y] location
+        target_edge: game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+        blocked_mask: The blocked tiles, see GameMap.blocked_mask
+
+    Returns:
+        True if an open tile of the edge is reachable, False if the unit would self destruct
+
+    """
+    edge = EDGE_MASKS[target_edge]
+    return bool(flood_fill(bit(location), ARENA_MASK & ~blocked_mask, edge) & edge)
+
+
+_range_masks = {}
+
+def range_mask(location, radius, get_hit_radius):
+    """Gets the tiles a unit at location reaches, matching GameMap.get_locations_in_range
+
+    Args:
+        location: The center of the area
+        radius: The range of the unit
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        The set of in bounds tiles whose centers are within radius + get_hit_radius
+
+    """
+    x, y = location
+    key = (x, y, radius, get_hit_radius)
+    mask = _range_masks.get(key)
+    if mask is None:
+        mask = mask_from_locations(locations_in_range(location, radius, get_hit_radius))
+        _range_masks[key] = mask
+    return mask
+
+
+def coverage(locations, radius, get_hit_radius):
+    """Gets the union of the ranges of units at several locations, such as every tile covered by a set of turrets
+
+    Args:
+        locations: A list of [x, y] locations
+        radius: The range of the units
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        The set of tiles reached by at least one of the units
+
+    """
+    mask = 0
+    for location in locations:
+        mask |= range_mask(location, radius, get_hit_radius)
+    return mask
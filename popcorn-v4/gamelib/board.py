@@ -0,0 +1,83 @@
+"""
+A compact, array backed copy of the structures on a GameMap.
+
+Every attribute is a flat array indexed by x * ARENA_SIZE + y, the same layout as
+GameMap.blocked_mask. Reading owner, type, health or upgrade state of a tile is a single
+array lookup. Whole board questions walk the owner and type bitboards GameMap already keeps,
+so they only visit the tiles that hold matching structures. The arrays pickle as raw bytes
+when handed to another process.
+"""
+
+from array import array
+
+ARENA_SIZE = 28
+EMPTY = -1
+
+
+class Board:
+    """Holds the structures of a GameMap as parallel arrays, kept in sync by GameMap
+
+    Health is recorded when a structure is placed or parsed, like GameMap.get_structure_health.
+
+    Attributes :
+        * type_index (dict): Maps a unit type shorthand to its index in the config's unitInformation
+        * occupied (bytearray): 1 if the tile holds a structure
+        * unit_type (array): The type index of the structure on the tile, or EMPTY
+        * owner (array): The player index owning the structure on the tile, or EMPTY
+        * health (array): The health of the structure on the tile, or 0
+        * upgraded (bytearray): 1 if the structure on the tile is upgraded
+
+    """
+    def __init__(self, config, structure_mask):
+        """Creates an empty board
+
+        Args:
+            config (JSON): Contains information about the game
+            structure_mask: Called as structure_mask(player_index, unit_type, region, upgraded) to get the bitboard
+                            of a player's matching structures, the GameMap's own index
+
+        """
+        size = ARENA_SIZE * ARENA_SIZE
+        self.type_index = {unit_information["shorthand"]: index
+                           for index, unit_information in enumerate(config["unitInformation"])}
+        self.occupied = bytearray(size)
+        self.unit_type = array('b', [EMPTY]) * size
+        self.owner = array('b', [EMPTY]) * size
+        self.health = array('d', [0.0]) * size
+        self.upgraded = bytearray(size)
+        self._structure_mask = structure_mask
+
+    def _place(self, index, unit):
+        self.occupied[index] = 1
+        self.unit_type[index] = self.type_index.get(unit.unit_type, EMPTY)
+        self.owner[index] = unit.player_index
+        self.health[index] = unit.health
+        self.upgraded[index] = 1 if unit.upgraded else 0
+
+    def _clear(self, index):
+        self.occupied[index] = 0
+        self.unit_type[index] = EMPTY
+        self.owner[index] = EMPTY
+        self.health[index] = 0.0
+        self.upgraded[index] = 0
+
+    def total_health(self, player_index, unit_type=None, region=None):
+        """Sums the health of a player's structures
+
+        Args:
+            player_index: The owner of the structures, 0 or 1
+            unit_type: Only count structures of this type, or None for every type
+            region: Only count structures inside this set of tiles, a bitboard mask such as bitboard.region_mask(0, 13)
+
+        Returns:
+            The summed health
+
+        """
+        mask = self._structure_mask(player_index, unit_type, region, False)
+        health = self.health
+        total = 0.0
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            total += health[low.bit_length() - 1]
+        return total
@@ -0,0 +1,135 @@
+"""
+Splits the time of a turn between the parts of an algo that want it.
+
+The engine measures how long each turn takes to submit and penalizes turns over the soft limit in
+the config's timingAndReplay section. It reports that time back as my_time on the next turn. A
+TurnBudget compares it to the time the algo measured itself, so the deadline of each turn leaves
+room for the time spent outside on_turn. Work asks the TurnDeadline for a TimeSlice. Lower priority
+slices end earlier, so the work that must run still fits before the deadline. See
+AlgoCore.turn_deadline.
+"""
+
+import time
+
+# Priorities of a time slice, and the fraction of the turn budget each one leaves for more important work
+CRITICAL = 0
+NORMAL = 1
+LOW = 2
+_RESERVE = (0.0, 0.1, 0.25)
+
+DEFAULT_SOFT_LIMIT = 4000
+
+
+class TimeSlice:
+    """A stretch of time ending at a fixed moment
+
+    Long running work should check expired() between steps and stop once it returns True.
+
+    Attributes :
+        * start (float): When the slice started, in time.perf_counter() seconds
+        * end (float): When the slice ends, in time.perf_counter() seconds
+
+    """
+    def __init__(self, seconds, start=None):
+        """Starts a slice
+
+        Args:
+            seconds: How long the slice lasts
+            start: When it starts, now if None
+
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.end = self.start + seconds
+
+    def elapsed(self):
+        """Seconds since the slice started"""
+        return time.perf_counter() - self.start
+
+    def remaining(self):
+        """Seconds until the slice ends, 0 once it has ended"""
+        return max(0.0, self.end - time.perf_counter())
+
+    def expired(self):
+        """True once the slice has ended"""
+        return time.perf_counter() >= self.end
+
+
+class TurnDeadline(TimeSlice):
+    """The time one turn can take before it is submitted
+
+    Attributes :
+        * budget (float): The seconds the turn was given
+
+    """
+    def __init__(self, seconds, start=None):
+        super().__init__(seconds, start)
+        self.budget = seconds
+
+    def slice(self, seconds=None, priority=NORMAL):
+        """Gets part of the time left in the turn
+
+        Args:
+            seconds: The most time the work wants, or None for as much as its priority allows
+            priority: CRITICAL, NORMAL or LOW. NORMAL slices end a tenth of the budget before the deadline
+                      and LOW slices a quarter, leaving that time for more important work.
+
+        Returns:
+            A TimeSlice starting now, which may already be expired if the turn is nearly over
+
+        """
+        now = time.perf_counter()
+        end = self.end - _RESERVE[priority] * self.budget
+        if seconds is not None:
+            end = min(end, now + seconds)
+        return TimeSlice(max(0.0, end - now), now)
+
+
+class TurnBudget:
+    """Decides how long each turn can take, from the times the engine reports
+
+    Attributes :
+        * soft_limit (float): The engine's soft time limit for a turn, in seconds
+        * safety (float): The fraction of the soft limit turns aim to use
+        * overhead (float): The largest recent gap between the time the engine measured and the time
+          the algo measured for a turn, in seconds
+
+    """
+    HISTORY = 5
+
+    def __init__(self, config=None, safety=0.9):
+        """
+        Args:
+            config (JSON): The game config, its timingAndReplay section holds the soft limit
+            safety: The fraction of the soft limit turns aim to use
+
+        """
+        timing = (config or {}).get("timingAndReplay", {})
+        self.soft_limit = timing.get("waitTimeBotSoft", DEFAULT_SOFT_LIMIT) / 1000
+        self.safety = safety
+        self.overhead = 0.0
+        self._overheads = []
+        self._measured = None
+        self._deadline = None
+
+    def start_turn(self, my_time):
+        """Opens the deadline of a new turn
+
+        Args:
+            my_time: The time the engine reports for the previous turn, in milliseconds, see GameState.my_time
+
+        Returns:
+            A TurnDeadline starting now
+
+        """
+        if self._measured is not None:
+            self._overheads = (self._overheads + [max(0.0, my_time / 1000 - self._measured)])[-self.HISTORY:]
+            self.overhead = max(self._overheads)
+            self._measured = None
+        self._deadline = TurnDeadline(max(0.0, self.soft_limit * self.safety - self.overhead))
+        return self._deadline
+
+    def end_turn(self):
+        """Records how long the turn took, call it once the turn has been submitted"""
+        if self._deadline is not None:
+            self._measured = self._deadline.elapsed()
+            self._deadline = None
@@ -0,0 +1,108 @@
+"""
+Coverage tables, recording for every tile which structures can reach it.
+
+Building a table costs one pass over each structure's range. After that any question
+about a tile, or a whole path, is a list lookup instead of a range search.
+"""
+
+from .game_map import ARENA_SIZE, locations_in_range
+
+
+def shield_amount(support):
+    """The shield a support gives each unit it shields, including its y position bonus
+
+    Args:
+        support: A support GameUnit
+
+    Returns:
+        The amount of shield given
+
+    """
+    y = support.y if support.player_index == 0 else 28 - support.y
+    return support.shieldPerUnit + y * support.shieldBonusPerY
+
+
+class CoverageTable:
+    """Records the structures covering each tile from the point of view of one player's mobile units
+
+    Attributes :
+        * player_index (int): The player whose mobile units the table describes
+        * version (int): The GameMap.structure_version the table was built from
+        * attackers (list): Per tile index x * 28 + y, the enemy structures that would attack a unit there
+        * damage (list): Per tile index, the damage per frame those structures deal to mobile units, a copy of GameMap.threat
+        * shielders (list): Per tile index, the friendly supports that would shield a unit there
+
+    """
+    def __init__(self, game_map, player_index):
+        """Builds the table from the structures on a map
+
+        Args:
+            game_map: The GameMap to read structures from
+            player_index: The player whose mobile units the table describes
+
+        """
+        self.player_index = player_index
+        self.version = game_map.structure_version
+        size = ARENA_SIZE * ARENA_SIZE
+        self.attackers = [[] for _ in range(size)]
+        self.damage = list(game_map.threat[player_index])
+        self.shielders = [[] for _ in range(size)]
+
+        blocked_mask = game_map.blocked_mask
+        while blocked_mask:
+            low = blocked_mask & -blocked_mask
+            blocked_mask ^= low
+            x, y = divmod(low.bit_length() - 1, ARENA_SIZE)
+            for unit in game_map[x, y]:
+                if not unit.stationary:
+                    continue
+                if unit.player_index != player_index and unit.damage_i > 0:
+                    for target_x, target_y in locations_in_range((x, y), unit.attackRange):
+                        self.attackers[target_x * ARENA_SIZE + target_y].append(unit)
+                elif unit.player_index == player_index and unit.shieldRange > 0:
+                    for target_x, target_y in locations_in_range((x, y), unit.shieldRange):
+                        self.shielders[target_x * ARENA_SIZE + target_y].append(unit)
+
+    def __deepcopy__(self, memo):
+        # Copies of a game state rebuild their tables on demand rather than paying for a deep copy here
+        stale = CoverageTable.__new__(CoverageTable)
+        stale.player_index = self.player_index
+        stale.version = -1
+        return stale
+
+    def profile(self, path):
+        """Gets the exposure of a unit walking a path
+
+        Args:
+            path: A list of locations, such as the result of GameState.find_path_to_edge
+
+        Returns:
+            A dict containing:
+                * attackers: Per step, the list of enemy structures attacking that location
+                * damage: Per step, the damage per frame taken at that location
+                * shielders: Per step, the supports shielding the unit for the first time at that location
+                * shield: Per step, the shield gained at that location
+                * total_damage: The sum of damage, the damage taken if the unit spends one frame on each location
+                * total_shield: The sum of shield
+
+        """
+        attackers = []
+        damage = []
+        shielders = []
+        shield = []
+        seen = set()
+        for x, y in path:
+            index = x * ARENA_SIZE + y
+            attackers.append(self.attackers[index])
+            damage.append(self.damage[index])
+            new_shielders = [unit for unit in self.shielders[index] if id(unit) not in seen]
+            seen.update(id(unit) for unit in new_shielders)
+            shielders.append(new_shielders)
+            shield.append(sum(shield_amount(unit) for unit in new_shielders))
+        return {
+            'attackers': attackers,
+            'damage': damage,
+            'shielders': shielders,
+            'shield': shield,
+            'total_damage': sum(damage),
+            'total_shield': sum(shield)}
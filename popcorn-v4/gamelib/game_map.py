@@ -1,7 +1,119 @@
+import copy
 import math
+from .board import Board
 from .unit import GameUnit
 from .util import debug_write
 
+ARENA_SIZE = 28
+HALF_ARENA = 14
+
+def _in_arena_bounds(x, y):
+    row = y if y < HALF_ARENA else ARENA_SIZE - 1 - y
+    return 0 <= y < ARENA_SIZE and HALF_ARENA - row - 1 <= x <= HALF_ARENA + row
+
+# Static tables describing the arena. Tiles are indexed x * ARENA_SIZE + y in IN_BOUNDS,
+# and locations are stored as tuples so the shared tables cannot be modified by accident.
+IN_BOUNDS = [_in_arena_bounds(x, y) for x in range(ARENA_SIZE) for y in range(ARENA_SIZE)]
+ALL_LOCATIONS = [(x, y) for y in range(ARENA_SIZE) for x in range(ARENA_SIZE) if _in_arena_bounds(x, y)]
+LOCATION_TO_INDEX = {location: i for i, location in enumerate(ALL_LOCATIONS)}
+BOTTOM_HALF_LOCATIONS = [(x, y) for x, y in ALL_LOCATIONS if y < HALF_ARENA]
+TOP_HALF_LOCATIONS = [(x, y) for x, y in ALL_LOCATIONS if y >= HALF_ARENA]
+# Indexed like the edge constants, each quadrant is the one touching that edge
+QUADRANT_LOCATIONS = [
+    [(x, y) for x, y in TOP_HALF_LOCATIONS if x >= HALF_ARENA],
+    [(x, y) for x, y in TOP_HALF_LOCATIONS if x < HALF_ARENA],
+    [(x, y) for x, y in BOTTOM_HALF_LOCATIONS if x < HALF_ARENA],
+    [(x, y) for x, y in BOTTOM_HALF_LOCATIONS if x >= HALF_ARENA]]
+# Indexed like the edge constants, the tiles along each edge in the order get_edges lists them
+EDGE_LOCATIONS = [
+    [(HALF_ARENA + n, ARENA_SIZE - 1 - n) for n in range(HALF_ARENA)],
+    [(HALF_ARENA - 1 - n, ARENA_SIZE - 1 - n) for n in range(HALF_ARENA)],
+    [(HALF_ARENA - 1 - n, n) for n in range(HALF_ARENA)],
+    [(HALF_ARENA + n, n) for n in range(HALF_ARENA)]]
+# Per tile index x * ARENA_SIZE + y: the edge the tile lies on or -1, the edge a unit spawned
+# there walks towards, and whether player 0 can deploy mobile units there
+EDGE_OF = [-1] * (ARENA_SIZE * ARENA_SIZE)
+for _edge, _locations in enumerate(EDGE_LOCATIONS):
+    for _x, _y in _locations:
+        EDGE_OF[_x * ARENA_SIZE + _y] = _edge
+TARGET_EDGE = [(max(edge, 0) + 2) % 4 for edge in EDGE_OF]
+DEPLOYABLE = [edge == 2 or edge == 3 for edge in EDGE_OF]
+
+_range_stencils = {}
+_locations_in_range = {}
+
+def range_stencil(radius, get_hit_radius=None):
+    """Gets the offsets from a unit to every tile center within its range
+
+    Args:
+        radius: The range of the unit
+        get_hit_radius: The getHitRadius from the game config, or None for the tiles at most radius away,
+            the rule GameState.get_attackers and coverage tables use
+
+    Returns:
+        A list of (dx, dy) offsets within radius + get_hit_radius, in the order get_locations_in_range scans them
+
+    """
+    key = (radius, get_hit_radius)
+    stencil = _range_stencils.get(key)
+    if stencil is None:
+        search_radius = int(math.ceil(radius))
+        if get_hit_radius is None:
+            stencil = [(dx, dy) for dx in range(-search_radius, search_radius + 1) for dy in range(-search_radius, search_radius + 1)
+                       if math.sqrt(dx ** 2 + dy ** 2) <= radius]
+        else:
+            stencil = [(dx, dy) for dx in range(-search_radius, search_radius + 1) for dy in range(-search_radius, search_radius + 1)
+                       if math.sqrt(dx ** 2 + dy ** 2) < radius + get_hit_radius]
+        _range_stencils[key] = stencil
+    return stencil
+
+def locations_in_range(location, radius, get_hit_radius=None):
+    """Gets the in bounds locations within range of a location, computed once per location and radius
+
+    Args:
+        location: The center of the area
+        radius: The range of the unit
+        get_hit_radius: The getHitRadius from the game config, or None for the tiles at most radius away, see range_stencil
+
+    Returns:
+        A tuple of (x, y) locations. It is shared between callers and must not be modified.
+
+    """
+    x, y = location
+    key = (x, y, radius, get_hit_radius)
+    locations = _locations_in_range.get(key)
+    if locations is None:
+        locations = tuple((x + dx, y + dy) for dx, dy in range_stencil(radius, get_hit_radius)
+                          if 0 <= x + dx < ARENA_SIZE and 0 <= y + dy < ARENA_SIZE and IN_BOUNDS[(x + dx) * ARENA_SIZE + y + dy])
+        _locations_in_range[key] = locations
+    return locations
+
+_rings_in_range = {}
+
+def rings_in_range(location, radius, get_hit_radius):
+    """Gets the locations_in_range of a location grouped into rings of equal distance, nearest first
+
+    Args:
+        location: The center of the area
+        radius: The range of the unit
+        get_hit_radius: The getHitRadius from the game config
+
+    Returns:
+        A tuple of rings, each a tuple of (x, y) locations in the order locations_in_range lists them.
+        It is shared between callers and must not be modified.
+
+    """
+    x, y = location
+    key = (x, y, radius, get_hit_radius)
+    rings = _rings_in_range.get(key)
+    if rings is None:
+        by_distance = {}
+        for target_x, target_y in locations_in_range(location, radius, get_hit_radius):
+            by_distance.setdefault((target_x - x) ** 2 + (target_y - y) ** 2, []).append((target_x, target_y))
+        rings = tuple(tuple(by_distance[distance]) for distance in sorted(by_distance))
+        _rings_in_range[key] = rings
+    return rings
+
 class GameMap:
     """Holds data about the current game map and provides functions
     useful for getting information related to the map.
@@ -9,6 +121,9 @@ class GameMap:
     game_map[x, y] will return a list of Units located at that location, 
     or an empty list if there are no units at the location
 
+    Iterating over a GameMap yields every location in the arena as an [x, y] list. It walks the
+    module level ALL_LOCATIONS table, so loops over the same map can be nested.
+
     Attributes :
         * config (JSON): Contains information about the current game rules
         * enable_warnings (bool): If true, debug messages for game_map functions will print out
@@ -18,6 +133,14 @@ class GameMap:
         * TOP_LEFT (int): A constant that represents the top left edge
         * BOTTOM_LEFT (int): Hidden challenge! Can you guess what this constant represents???
         * BOTTOM_RIGHT (int): A constant that represents the bottom right edge
+        * blocked_mask (int): Bitset of the tiles holding a structure, bit x * ARENA_SIZE + y is set for [x, y]
+        * structure_masks ([int, int]): Bitsets of the tiles holding a structure owned by player 0 and player 1. See bitboard.py
+        * structure_version (int): Incremented whenever a structure is added, removed or upgraded
+            The structures are also indexed by owner and type, see get_structures, count_structures and get_structure_health
+        * board (Board): The structures as flat arrays of type, owner, health and upgrade state. See board.py
+        * threat ([list, list]): Per player, the damage per frame enemy structures deal to that player's mobile units on each tile index x * ARENA_SIZE + y
+        * get_hit_radius (float): The getHitRadius from the config
+        * max_attack_range (float): The largest base attackRange in the config
 
     """
     def __init__(self, config):
@@ -36,9 +159,28 @@ class GameMap:
         self.BOTTOM_LEFT = 2
         self.BOTTOM_RIGHT = 3
         self.__map = self.__empty_grid()
-        self.__start = [13,0]
+        self.blocked_mask = 0
+        self.structure_masks = [0, 0]
+        self.structure_version = 0
+        self.__type_masks = [{}, {}]
+        self.__upgraded_masks = [0, 0]
+        self.__indexed = [None] * (self.ARENA_SIZE * self.ARENA_SIZE)
+        self._undo_log = None
+        self.board = Board(config, self.__structure_mask)
+        self.threat = [[0] * (self.ARENA_SIZE * self.ARENA_SIZE), [0] * (self.ARENA_SIZE * self.ARENA_SIZE)]
 
         self.edges = self.get_edges()
+
+        # Range stencils are built once per distinct radius in the config and shared by every map
+        self.get_hit_radius = config["unitInformation"][0]['getHitRadius']
+        self.max_attack_range = 0
+        for unit_information in config["unitInformation"]:
+            self.max_attack_range = max(self.max_attack_range, unit_information.get('attackRange', 0))
+            for stats in (unit_information, unit_information.get('upgrade', {})):
+                for key in ('attackRange', 'shieldRange'):
+                    if key in stats:
+                        range_stencil(stats[key], self.get_hit_radius)
+                        range_stencil(stats[key])
     
     def __getitem__(self, location):
         if len(location) == 2 and self.in_arena_bounds(location):
@@ -48,26 +190,15 @@ class GameMap:
 
     def __setitem__(self, location, val):
         if type(location) in [tuple, list] and len(location) == 2 and self.in_arena_bounds(location):
-            self.__map[location[0]][location[1]] = val
+            x, y = location
+            self.__log_tile(x, y)
+            self.__map[x][y] = val
+            self.__update_blocked(x, y)
             return
         self._invalid_coordinates(location)
 
     def __iter__(self):
-        self.__start = [13,0]
-        return self
-    
-    def __next__(self):
-        location = self.__start
-        if location == [15,27]:
-            raise StopIteration
-        new_location = [location[0]+1, location[1]]
-        while not self.in_arena_bounds(new_location) and not location == [14,27]:
-            if new_location[0] == self.ARENA_SIZE:
-                new_location = [0, new_location[1]+1]
-            else:
-                new_location = [new_location[0]+1, new_location[1]]
-        self.__start = new_location
-        return location 
+        return ([x, y] for x, y in ALL_LOCATIONS)
 
     def __empty_grid(self):
         grid = []
@@ -77,6 +208,161 @@ class GameMap:
                 grid[x].append([])
         return grid
 
+    def __update_blocked(self, x, y):
+        self.structure_version += 1
+        bit = 1 << (x * self.ARENA_SIZE + y)
+        if self.blocked_mask & bit:
+            self.__unindex(x, y, bit)
+        for unit in self.__map[x][y]:
+            if unit.stationary:
+                self.__set_blocked(unit)
+
+    def __set_blocked(self, unit):
+        self.structure_version += 1
+        index = unit.x * self.ARENA_SIZE + unit.y
+        bit = 1 << index
+        if self.blocked_mask & bit:
+            self.__unindex(unit.x, unit.y, bit)
+        self.blocked_mask |= bit
+        if unit.player_index not in (0, 1):
+            return
+        self.board._place(index, unit)
+        player_index = unit.player_index
+        self.structure_masks[player_index] |= bit
+        type_masks = self.__type_masks[player_index]
+        type_masks[unit.unit_type] = type_masks.get(unit.unit_type, 0) | bit
+        if unit.upgraded:
+            self.__upgraded_masks[player_index] |= bit
+        self.__indexed[index] = (player_index, unit.unit_type, unit.damage_i, unit.attackRange)
+        if unit.damage_i > 0:
+            self.__add_threat(unit.x, unit.y, 1 - player_index, unit.damage_i, unit.attackRange)
+
+    def __unindex(self, x, y, bit):
+        # Forgets the structure indexed at a tile, using what was recorded when it was indexed
+        index = x * self.ARENA_SIZE + y
+        self.blocked_mask &= ~bit
+        entry = self.__indexed[index]
+        if entry is None:
+            return
+        player_index, unit_type, damage, attack_range = entry
+        if damage > 0:
+            self.__add_threat(x, y, 1 - player_index, -damage, attack_range)
+        self.__indexed[index] = None
+        self.board._clear(index)
+        self.structure_masks[player_index] &= ~bit
+        self.__type_masks[player_index][unit_type] &= ~bit
+        self.__upgraded_masks[player_index] &= ~bit
+
+    def __add_threat(self, x, y, player_index, damage, attack_range):
+        threat = self.threat[player_index]
+        # Tiles at most attack_range away, the same rule as GameState.get_attackers
+        for target_x, target_y in locations_in_range((x, y), attack_range):
+            threat[target_x * self.ARENA_SIZE + target_y] += damage
+
+    def _place_unit(self, unit):
+        """Appends an already constructed unit to its location, used when parsing the game state"""
+        self.__log_tile(unit.x, unit.y)
+        self.__map[unit.x][unit.y].append(unit)
+        if unit.stationary:
+            self.__set_blocked(unit)
+
+    def _upgrade_unit(self, unit):
+        """Upgrades a structure already on the map, used by GameState for upgrades and parsing"""
+        if self._undo_log is not None:
+            self._undo_log.append((unit, copy.copy(unit)))
+        unit.upgrade()
+        # Re-index the tile so the upgraded stats replace the old ones everywhere
+        self.__update_blocked(unit.x, unit.y)
+
+    def __log_tile(self, x, y):
+        if self._undo_log is not None:
+            self._undo_log.append((x, y, list(self.__map[x][y])))
+
+    def _start_undo_log(self):
+        """Starts recording changes so they can be undone, returns the current position in the log"""
+        if self._undo_log is None:
+            self._undo_log = []
+        return len(self._undo_log)
+
+    def _stop_undo_log(self):
+        """Stops recording changes and forgets the log"""
+        self._undo_log = None
+
+    def _undo(self, position):
+        """Reverts every change recorded after position in the undo log, most recent first"""
+        log = self._undo_log
+        while len(log) > position:
+            entry = log.pop()
+            if len(entry) == 3:
+                x, y, units = entry
+                self.__map[x][y] = units
+            else:
+                unit, saved = entry
+                for name in GameUnit.__slots__:
+                    setattr(unit, name, getattr(saved, name))
+                x, y = unit.x, unit.y
+            self.__update_blocked(x, y)
+
+    def __structure_mask(self, player_index, unit_type, region, upgraded):
+        if unit_type is None:
+            mask = self.structure_masks[player_index]
+        else:
+            mask = self.__type_masks[player_index].get(unit_type, 0)
+        if region is not None:
+            mask &= region
+        if upgraded:
+            mask &= self.__upgraded_masks[player_index]
+        return mask
+
+    def get_structures(self, player_index, unit_type=None, region=None, upgraded=False):
+        """Finds the structures a player owns without scanning the board
+
+        Args:
+            player_index: The owner of the structures, 0 or 1
+            unit_type: Only return structures of this type, or None for every type
+            region: Only return structures inside this set of tiles, a bitboard mask such as bitboard.region_mask(0, 5)
+            upgraded: If True only return upgraded structures
+
+        Returns:
+            A list of structures, ordered by x then y
+
+        """
+        mask = self.__structure_mask(player_index, unit_type, region, upgraded)
+        structures = []
+        while mask:
+            low = mask & -mask
+            mask ^= low
+            x, y = divmod(low.bit_length() - 1, self.ARENA_SIZE)
+            for unit in self.__map[x][y]:
+                if unit.stationary:
+                    structures.append(unit)
+        return structures
+
+    def count_structures(self, player_index, unit_type=None, region=None, upgraded=False):
+        """Counts the structures a player owns, see get_structures for the arguments
+
+        Returns:
+            The number of matching structures
+
+        """
+        return bin(self.__structure_mask(player_index, unit_type, region, upgraded)).count("1")
+
+    def get_structure_health(self, player_index, unit_type=None):
+        """Gets the total health of a player's structures
+
+        Health is recorded when a structure is placed or parsed, so damage dealt to a unit
+        object afterwards is not reflected until the structure is placed again.
+
+        Args:
+            player_index: The owner of the structures, 0 or 1
+            unit_type: Only count structures of this type, or None for every type
+
+        Returns:
+            The summed health
+
+        """
+        return self.board.total_health(player_index, unit_type)
+
     def _invalid_coordinates(self, location):
         self.warn("{} is out of bounds.".format(str(location)))
 
@@ -91,19 +377,7 @@ class GameMap:
         
         """
         x, y = location
-        half_board = self.HALF_ARENA
-
-        row_size = y + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        top_half_check = (y < self.HALF_ARENA and x >= startx and x <= endx)
-
-        row_size = (self.ARENA_SIZE - 1 - y) + 1
-        startx = half_board - row_size
-        endx = startx + (2 * row_size) - 1
-        bottom_half_check = (y >= self.HALF_ARENA and x >= startx and x <= endx)
-
-        return bottom_half_check or top_half_check
+        return 0 <= x < ARENA_SIZE and 0 <= y < ARENA_SIZE and IN_BOUNDS[int(x) * ARENA_SIZE + int(y)]
 
     def get_edge_locations(self, quadrant_description):
         """Takes in an edge description and returns a list of locations.
@@ -169,11 +443,13 @@ class GameMap:
             self.warn("Player index {} is invalid. Player index should be 0 or 1.".format(player_index))
 
         x, y = location
+        self.__log_tile(x, y)
         new_unit = GameUnit(unit_type, self.config, player_index, None, location[0], location[1], self.spawn_loc_to_target_edge(location))
         if not new_unit.stationary:
             self.__map[x][y].append(new_unit)
         else:
             self.__map[x][y] = [new_unit]
+            self.__update_blocked(x, y)
 
     def remove_unit(self, location):
         """Remove all units on the map in the given location.
@@ -188,7 +464,9 @@ class GameMap:
             self._invalid_coordinates(location)
         
         x, y = location
+        self.__log_tile(x, y)
         self.__map[x][y] = []
+        self.__update_blocked(x, y)
 
     def get_locations_in_range(self, location, radius):
         """Gets locations in a circular area around a location
@@ -206,17 +484,8 @@ class GameMap:
         if not self.in_arena_bounds(location):
             self._invalid_coordinates(location)
 
-        x, y = location
-        locations = []
-        search_radius = math.ceil(radius)
-        getHitRadius = self.config["unitInformation"][0]['getHitRadius']
-        for i in range(int(x - search_radius), int(x + search_radius + 1)):
-            for j in range(int(y - search_radius), int(y + search_radius + 1)):
-                new_location = [i, j]
-                # A unit with a given range affects all locations who's centers are within that range + get hit radius
-                if self.in_arena_bounds(new_location) and self.distance_between_locations(location, new_location) < radius + getHitRadius:
-                    locations.append(new_location)
-        return locations
+        # A unit with a given range affects all locations who's centers are within that range + get hit radius
+        return [[x, y] for x, y in locations_in_range(location, radius, self.get_hit_radius)]
 
     def distance_between_locations(self, location_1, location_2):
         """Euclidean distance
@@ -243,16 +512,10 @@ class GameMap:
 
     def spawn_loc_to_target_edge(self, spawn_loc):
 
-        e = 0
-        
-        for i, edge in enumerate(self.edges):
-
-            if spawn_loc in edge:
-
-                e = i
-                break
-
-        return (e + 2) % 4
+        x, y = spawn_loc
+        if 0 <= x < self.ARENA_SIZE and 0 <= y < self.ARENA_SIZE:
+            return TARGET_EDGE[x * self.ARENA_SIZE + y]
+        return 2
 
     def get_map(self):
 
@@ -1,21 +1,36 @@
+import copy
 import math
 import json
 import sys
 
-from .navigation import ShortestPathFinder
+from .navigation import DynamicPathFinder, PathCache
 from .util import send_command, debug_write
-from .unit import GameUnit
-from .game_map import GameMap
+from .unit import GameUnit, UnitRegistry
+from .game_map import GameMap, locations_in_range, rings_in_range, DEPLOYABLE, IN_BOUNDS
+from . import bitboard
+from .coverage import CoverageTable
 
-def is_stationary(unit_type):
+SP = 0
+MP = 1
+
+# The wall, support and turret shorthands of the standard config
+STANDARD_STRUCTURE_TYPES = ("FF", "EF", "DF")
+
+def is_stationary(unit_type, registry=None):
     """
+        Kept for older strategies. Prefer GameState.is_stationary or GameUnit.stationary.
+
         Args:
             unit_type: A unit type
+            registry: The UnitRegistry of the config, such as game_state.registry. If None the
+                      standard structure shorthands are used.
         
         Returns: 
             Boolean, True if the unit is stationary, False otherwise.
     """
-    return unit_type in STRUCTURE_TYPES
+    if registry is None:
+        return unit_type in STANDARD_STRUCTURE_TYPES
+    return registry.is_stationary(unit_type)
 
 class GameState:
     """Represents the entire gamestate for a given turn
@@ -31,7 +46,8 @@ class GameState:
         * INTERCEPTOR (str): A constant representing the interceptor unit
         * REMOVE (str): A constant representing removing your own unit
         * UPGRADE (str): A constant representing upgrading a unit
-        * STRUCTURE_TYPES (list): A list of the structure units
+        * STRUCTURE_TYPES (tuple): The structure units
+        * registry (UnitRegistry): The unit types of the config, see unit.py
 
         * ARENA_SIZE (int): The size of the arena
         * HALF_ARENA (int): Half the size of the arena
@@ -39,6 +55,7 @@ class GameState:
         * SP (int): A constant representing the SP resource, used in the get_resource function
          
         * game_map (:obj: GameMap): The current GameMap. To retrieve a list of GameUnits at a location, use game_map[x, y]
+            Units are only created the first time game_map is used, so a strategy reading just resources and health never builds them
         * turn_number (int): The current turn number. Starts at 0.
         * my_health (int): Your current remaining health
         * my_time (int): The time you took to submit your previous turn
@@ -52,58 +69,60 @@ class GameState:
 
         Args:
             * config (JSON): A json object containing information about the game
-            * serialized_string (string): A string containing information about the game state at the start of this turn
+            * serialized_string (string): A string containing information about the game state at the start of this turn,
+              or the same state already decoded with json.loads
 
         """
         self.serialized_string = serialized_string
         self.config = config
         self.enable_warnings = True
 
-        global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        WALL = config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[WALL] = 0
-        SUPPORT = config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SUPPORT] = 1
-        TURRET = config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[TURRET] = 2
-        SCOUT = config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCOUT] = 3
-        DEMOLISHER = config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DEMOLISHER] = 4
-        INTERCEPTOR = config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[INTERCEPTOR] = 5
-        REMOVE = config["unitInformation"][6]["shorthand"]
-        UNIT_TYPE_TO_INDEX[REMOVE] = 6
-        UPGRADE = config["unitInformation"][7]["shorthand"]
-        UNIT_TYPE_TO_INDEX[UPGRADE] = 7
-
-        ALL_UNITS = [SCOUT, DEMOLISHER, INTERCEPTOR, WALL, SUPPORT, TURRET]
-        STRUCTURE_TYPES = [WALL, SUPPORT, TURRET]
+        self.registry = UnitRegistry.for_config(config)
+        self.UNIT_TYPE_TO_INDEX = self.registry.UNIT_TYPE_TO_INDEX
+        self.WALL = self.registry.WALL
+        self.SUPPORT = self.registry.SUPPORT
+        self.TURRET = self.registry.TURRET
+        self.SCOUT = self.registry.SCOUT
+        self.DEMOLISHER = self.registry.DEMOLISHER
+        self.INTERCEPTOR = self.registry.INTERCEPTOR
+        self.REMOVE = self.registry.REMOVE
+        self.UPGRADE = self.registry.UPGRADE
+        self.STRUCTURE_TYPES = self.registry.STRUCTURE_TYPES
 
         self.ARENA_SIZE = 28
         self.HALF_ARENA = int(self.ARENA_SIZE / 2)
-        self.MP = 1
-        self.SP = 0
-        global MP, SP
-        MP = self.MP
-        SP = self.SP
-
-        self.game_map = GameMap(self.config)
-        self._shortest_path_finder = ShortestPathFinder()
+        self.MP = MP
+        self.SP = SP
+
+        self._game_map = None
+        self._unparsed_units = None
+        self._dynamic_path_finder = None
+        self._path_cache = PathCache()
+        self._coverage_tables = [None, None]
         self._build_stack = []
         self._deploy_stack = []
+        self._checkpoints = []
         self._player_resources = [
                 {'SP': 0, 'MP': 0},  # player 0, which is you
                 {'SP': 0, 'MP': 0}]  # player 1, which is the opponent
         self.__parse_state(serialized_string)
 
+    def __deepcopy__(self, memo):
+        # The config is read only, sharing it keeps the copy on the same UnitRegistry and unit stats
+        memo[id(self.config)] = self.config
+        other = type(self).__new__(type(self))
+        memo[id(self)] = other
+        for name, value in self.__dict__.items():
+            setattr(other, name, copy.deepcopy(value, memo))
+        return other
+
     def __parse_state(self, state_line):
         """
-        Fills in map based on the serialized game state so that self.game_map[x,y] is a list of GameUnits at that location.
-        state_line is the game state as a json string.
+        Reads the turn info and player stats from the serialized game state. The units are kept aside
+        until game_map is first used.
+        state_line is the game state as a json string or an already decoded dict.
         """
-        state = json.loads(state_line)
+        state = json.loads(state_line) if isinstance(state_line, str) else state_line
 
         turn_info = state["turnInfo"]
         self.turn_number = int(turn_info[1])
@@ -120,11 +139,23 @@ class GameState:
             {'SP': p1_SP, 'MP': p1_MP},
             {'SP': p2_SP, 'MP': p2_MP}]
 
-        p1units = state["p1Units"]
-        p2units = state["p2Units"]
+        self._unparsed_units = [state["p1Units"], state["p2Units"]]
+
+    @property
+    def game_map(self):
+        if self._game_map is None:
+            self._game_map = GameMap(self.config)
+            if self._unparsed_units is not None:
+                p1units, p2units = self._unparsed_units
+                self._unparsed_units = None
+                self.__create_parsed_units(p1units, 0)
+                self.__create_parsed_units(p2units, 1)
+        return self._game_map
 
-        self.__create_parsed_units(p1units, 0)
-        self.__create_parsed_units(p2units, 1)
+    @game_map.setter
+    def game_map(self, game_map):
+        self._game_map = game_map
+        self._unparsed_units = None
 
     def __create_parsed_units(self, units, player_number):
         """
@@ -138,19 +169,19 @@ class GameState:
                 x, y = map(int, [sx, sy])
                 hp = float(shp)
                 # This depends on RM and UP always being the last types to be processed
-                if unit_type == REMOVE:
+                if unit_type == self.registry.REMOVE:
                     # Quick fix will deploy engine fix soon
                     if self.contains_stationary_unit([x,y]):
                         self.game_map[x,y][0].pending_removal = True
-                elif unit_type == UPGRADE:
+                elif unit_type == self.registry.UPGRADE:
                     if self.contains_stationary_unit([x,y]):
-                        self.game_map[x,y][0].upgrade()
+                        self.game_map._upgrade_unit(self.game_map[x,y][0])
                 else:
                     unit = GameUnit(unit_type, self.config, player_number, hp, x, y)
-                    self.game_map[x,y].append(unit)
+                    self.game_map._place_unit(unit)
 
     def __resource_required(self, unit_type):
-        return self.SP if is_stationary(unit_type) else self.MP
+        return self.SP if self.registry.is_stationary(unit_type) else self.MP
 
     def __set_resource(self, resource_type, amount, player_index=0):
         """
@@ -179,7 +210,7 @@ class GameState:
             Returns: 
                 Boolean, True if the unit is stationary, False otherwise.
         """
-        return unit_type in STRUCTURE_TYPES
+        return self.registry.is_stationary(unit_type)
 
     def submit_turn(self):
         """Submit and end your turn.
@@ -244,7 +275,7 @@ class GameState:
             The number of units affordable of the given unit_type.
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.registry.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
 
@@ -292,6 +323,48 @@ class GameState:
             MP = round(MP, 1)
         return MP
 
+    def project_resources(self, turns_in_future=1, spending=None):
+        """Projects the SP and MP of both players over several turns, for many spending plans at once
+
+        MP follows the same rules as project_future_MP and SP grows by coresPerRound each turn. The income
+        of each turn is worked out once and applied to every plan together.
+
+        Args:
+            turns_in_future: The number of turns in the future to project
+            spending: A list of [SP, MP] amounts spent this turn, one per plan, for example
+                [[0, k] for k in range(int(game_state.get_resource(MP)) + 1)]. Defaults to a single plan spending nothing
+
+        Returns:
+            A list indexed [player_index][plan][turn] of [SP, MP]. Turn 0 holds what is left after spending this turn,
+            turn n what the player will have n turns from now
+
+        """
+        if turns_in_future < 1 or turns_in_future > 99:
+            self.warn("Invalid turns in future used ({}). Turns in future should be between 1 and 99".format(turns_in_future))
+        if spending is None:
+            spending = [[0, 0]]
+
+        resources = self.config["resources"]
+        kept = 1 - resources["bitDecayPerRound"]
+        MP_gains = [resources["bitsPerRound"] + resources["bitGrowthRate"] * ((self.turn_number + increment) // resources["turnIntervalForBitSchedule"])
+                    for increment in range(1, turns_in_future + 1)]
+        SP_gain = resources["coresPerRound"]
+
+        table = []
+        for player_index in (0, 1):
+            held = self.get_resources(player_index)
+            SP_column = [held[SP] - spent[SP] for spent in spending]
+            MP_column = [held[MP] - spent[MP] for spent in spending]
+            SP_columns = [SP_column]
+            MP_columns = [MP_column]
+            for MP_gained in MP_gains:
+                SP_column = [amount + SP_gain for amount in SP_column]
+                MP_column = [round(amount * kept + MP_gained, 1) for amount in MP_column]
+                SP_columns.append(SP_column)
+                MP_columns.append(MP_column)
+            table.append([[list(pair) for pair in zip(SP_row, MP_row)] for SP_row, MP_row in zip(zip(*SP_columns), zip(*MP_columns))])
+        return table
+
     def type_cost(self, unit_type, upgrade=False):
         """Gets the cost of a unit based on its type
 
@@ -302,11 +375,11 @@ class GameState:
             The units costs as a list [SP, MP]
 
         """
-        if unit_type == REMOVE:
+        if unit_type == self.registry.REMOVE:
             self._invalid_unit(unit_type)
             return
         
-        unit_def = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[unit_type]]
+        unit_def = self.config["unitInformation"][self.registry.UNIT_TYPE_TO_INDEX[unit_type]]
         cost_base = [unit_def.get('cost1', 0), unit_def.get('cost2', 0)]
         if upgrade:
             return [unit_def.get('upgrade', {}).get('cost1', cost_base[SP]), unit_def.get('upgrade', {}).get('cost2', cost_base[MP])]
@@ -330,7 +403,7 @@ class GameState:
             True if we can spawn the unit(s)
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.registry.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         
@@ -340,10 +413,10 @@ class GameState:
             return False
 
         affordable = self.number_affordable(unit_type) >= num
-        stationary = is_stationary(unit_type)
+        stationary = self.registry.is_stationary(unit_type)
         blocked = self.contains_stationary_unit(location) or (stationary and len(self.game_map[location[0],location[1]]) > 0)
         correct_territory = location[1] < self.HALF_ARENA
-        on_edge = location in (self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT))
+        on_edge = DEPLOYABLE[location[0] * self.ARENA_SIZE + location[1]]
 
         if self.enable_warnings:
             fail_reason = ""
@@ -374,7 +447,7 @@ class GameState:
             The number of units successfully spawned
 
         """
-        if unit_type not in ALL_UNITS:
+        if unit_type not in self.registry.ALL_UNITS:
             self._invalid_unit(unit_type)
             return
         if num < 1 or not locations:
@@ -392,7 +465,7 @@ class GameState:
                     self.__set_resource(SP, 0 - costs[SP])
                     self.__set_resource(MP, 0 - costs[MP])
                     self.game_map.add_unit(unit_type, location, 0)
-                    if is_stationary(unit_type):
+                    if self.registry.is_stationary(unit_type):
                         self._build_stack.append((unit_type, x, y))
                     else:
                         self._deploy_stack.append((unit_type, x, y))
@@ -417,7 +490,7 @@ class GameState:
         for location in locations:
             if location[1] < self.HALF_ARENA and self.contains_stationary_unit(location):
                 x, y = map(int, location)
-                self._build_stack.append((REMOVE, x, y))
+                self._build_stack.append((self.registry.REMOVE, x, y))
                 removed_units += 1
             else:
                 self.warn("Could not remove a unit from {}. Location has no structures or is enemy territory.".format(location))
@@ -449,19 +522,179 @@ class GameState:
                     if unit.stationary:
                         existing_unit = unit
 
-                if not existing_unit.upgraded and self.config["unitInformation"][UNIT_TYPE_TO_INDEX[existing_unit.unit_type]].get("upgrade", None) is not None:
+                if not existing_unit.upgraded and self.config["unitInformation"][self.registry.UNIT_TYPE_TO_INDEX[existing_unit.unit_type]].get("upgrade", None) is not None:
                     costs = self.type_cost(existing_unit.unit_type, True)
                     resources = self.get_resources()
                     if resources[SP] >= costs[SP] and resources[MP] >= costs[MP]:
                         self.__set_resource(SP, 0 - costs[SP])
                         self.__set_resource(MP, 0 - costs[MP])
-                        existing_unit.upgrade()
-                        self._build_stack.append((UPGRADE, x, y))
+                        self.game_map._upgrade_unit(existing_unit)
+                        self._build_stack.append((self.registry.UPGRADE, x, y))
                         spawned_units += 1
             else:
                 self.warn("Could not upgrade a unit from {}. Location has no structures or is enemy territory.".format(location))
         return spawned_units
 
+    def attempt_build(self, plan, stop_when_unaffordable=True):
+        """Attempts an ordered plan of spawns, upgrades and removals in a single pass
+
+        Each item is checked with the same rules as attempt_spawn, attempt_upgrade and attempt_remove,
+        against the map and the resources left by the items before it, but costs are looked up once per
+        type and no warning is built per item.
+
+        Args:
+            plan: A list of (action, location) or (action, location, num) tuples, where action is a unit type
+                to spawn, UPGRADE or REMOVE. num is how many mobile units to deploy
+            stop_when_unaffordable: If True the plan stops at the first item that cannot be afforded, so an
+                affordable prefix is built and mobile units are deployed all or none. If False unaffordable items
+                are skipped and as many mobile units are deployed as can be afforded, like attempt_spawn does
+
+        Returns:
+            A dict containing:
+                * built: The items that were committed, in plan order. An item whose units were only partly
+                  deployed is listed as (action, location, number deployed)
+                * skipped: A (item, reason) pair for every item that was not
+
+        """
+        registry = self.registry
+        grid = self.game_map.get_map()
+        resources = self._player_resources[0]
+        costs_by_type = {}
+        built = []
+        skipped = []
+        for position, item in enumerate(plan):
+            action, location = item[0], item[1]
+            x, y = map(int, location)
+            if not (0 <= x < self.ARENA_SIZE and 0 <= y < self.HALF_ARENA and IN_BOUNDS[x * self.ARENA_SIZE + y]):
+                skipped.append((item, "Location invalid or in enemy territory."))
+                continue
+            units = grid[x][y]
+            structure = None
+            for unit in units:
+                if unit.stationary:
+                    structure = unit
+
+            if action == registry.REMOVE:
+                if structure is None:
+                    skipped.append((item, "Location has no structures."))
+                else:
+                    self._build_stack.append((registry.REMOVE, x, y))
+                    built.append(item)
+                continue
+            if action == registry.UPGRADE:
+                if structure is None or structure.upgraded or "upgrade" not in self.config["unitInformation"][registry.UNIT_TYPE_TO_INDEX[structure.unit_type]]:
+                    skipped.append((item, "Location has no structure that can be upgraded."))
+                    continue
+                key = (structure.unit_type, True)
+                count = 1
+            elif action in registry.ALL_UNITS:
+                stationary = registry.is_stationary(action)
+                if structure is not None or (stationary and units):
+                    skipped.append((item, "Location is blocked."))
+                    continue
+                if not stationary and not DEPLOYABLE[x * self.ARENA_SIZE + y]:
+                    skipped.append((item, "Information units must be deployed on the edge."))
+                    continue
+                key = (action, False)
+                count = 1 if stationary else (item[2] if len(item) > 2 else 1)
+            else:
+                skipped.append((item, "Invalid unit {}.".format(action)))
+                continue
+
+            costs = costs_by_type.get(key)
+            if costs is None:
+                costs = self.type_cost(*key)
+                costs_by_type[key] = costs
+            if stop_when_unaffordable:
+                affordable = count if resources['SP'] >= costs[SP] * count and resources['MP'] >= costs[MP] * count else 0
+            else:
+                # Count unit by unit like attempt_spawn, which deploys as many as it can pay for
+                affordable = 0
+                held_SP, held_MP = resources['SP'], resources['MP']
+                while affordable < count and held_SP >= costs[SP] and held_MP >= costs[MP]:
+                    held_SP -= costs[SP]
+                    held_MP -= costs[MP]
+                    affordable += 1
+            if affordable == 0:
+                skipped.append((item, "Not enough resources."))
+                if stop_when_unaffordable:
+                    skipped.extend((later, "Not reached, an earlier item could not be afforded.") for later in plan[position + 1:])
+                    break
+                continue
+            if action == registry.UPGRADE:
+                resources['SP'] -= costs[SP]
+                resources['MP'] -= costs[MP]
+                self.game_map._upgrade_unit(structure)
+                self._build_stack.append((registry.UPGRADE, x, y))
+            else:
+                for _ in range(affordable):
+                    resources['SP'] -= costs[SP]
+                    resources['MP'] -= costs[MP]
+                    self.game_map.add_unit(action, [x, y], 0)
+                    if stationary:
+                        self._build_stack.append((action, x, y))
+                    else:
+                        self._deploy_stack.append((action, x, y))
+            built.append(item if affordable == count else (action, location, affordable))
+
+        if skipped:
+            self.warn("attempt_build skipped {} of {} items, the first because: {}".format(len(skipped), len(plan), skipped[0][1]))
+        return {'built': built, 'skipped': skipped}
+
+    def checkpoint(self):
+        """Marks the current state so later changes can be undone with rollback
+
+        Changes made through attempt_spawn, attempt_remove, attempt_upgrade and the GameMap
+        functions are recorded from here on. Checkpoints nest, rollback and commit always act on
+        the most recent one.
+
+        Returns:
+            The number of open checkpoints, including this one
+
+        """
+        self._checkpoints.append((
+            self.game_map._start_undo_log(),
+            [dict(resources) for resources in self._player_resources],
+            len(self._build_stack),
+            len(self._deploy_stack)))
+        return len(self._checkpoints)
+
+    def rollback(self):
+        """Undoes every change made since the most recent checkpoint and closes it
+
+        The cost is proportional to the number of changes undone, not the size of the map.
+
+        Returns:
+            True if there was a checkpoint to roll back to
+
+        """
+        if not self._checkpoints:
+            self.warn("rollback was called without a checkpoint")
+            return False
+        position, resources, build_length, deploy_length = self._checkpoints.pop()
+        self.game_map._undo(position)
+        self._player_resources = resources
+        del self._build_stack[build_length:]
+        del self._deploy_stack[deploy_length:]
+        if not self._checkpoints:
+            self.game_map._stop_undo_log()
+        return True
+
+    def commit(self):
+        """Keeps the changes made since the most recent checkpoint and closes it
+
+        Returns:
+            True if there was a checkpoint to close
+
+        """
+        if not self._checkpoints:
+            self.warn("commit was called without a checkpoint")
+            return False
+        self._checkpoints.pop()
+        if not self._checkpoints:
+            self.game_map._stop_undo_log()
+        return True
+
     def get_target_edge(self, start_location):
         """Gets the target edge given a starting location
 
@@ -497,6 +730,9 @@ class GameState:
             A list of locations corresponding to the path the unit would take 
             to get from it's starting location to the best available end location
 
+        Paths are cached by structure layout, start and edge, so repeated calls on an unchanged map are cheap.
+        Structures added or removed through game_map.add_unit and game_map.remove_unit are picked up automatically.
+
         """
         if self.contains_stationary_unit(start_location):
             self.warn("Attempted to perform pathing from blocked starting location {}".format(start_location))
@@ -505,8 +741,168 @@ class GameState:
         if target_edge is None:
             target_edge = self.get_target_edge(start_location)
 
-        end_points = self.game_map.get_edge_locations(target_edge)
-        return self._shortest_path_finder.navigate_multiple_endpoints(start_location, end_points, self)
+        key = (self.game_map.blocked_mask, start_location[0], start_location[1], target_edge)
+        path = self._path_cache.get(key)
+        if path is None:
+            path = self.get_path_finder().navigate(start_location, target_edge)
+            self._path_cache.put(key, path)
+        return [location[:] for location in path]
+
+    def find_paths_to_edges(self, start_locations=None, target_edges=None):
+        """Gets the paths units at several locations would take, in a single pass
+
+        Much cheaper than calling find_path_to_edge once per location, since every start
+        heading for the same edge shares one distance field.
+
+        Args:
+            start_locations: A list of locations. Defaults to every location on your two deploy edges.
+            target_edges: An edge used for every start location, a list with one edge per start location,
+                or None to induce each edge from its start location
+
+        Returns:
+            A list with one dict per start location, in the same order, containing:
+                * start: The start location
+                * path: The path the unit would take, as returned by find_path_to_edge. None if the start is blocked
+                * length: The number of steps in the path
+                * self_destruct: True if the path ends before reaching the target edge
+                * end: The last location of the path
+
+        """
+        if start_locations is None:
+            start_locations = self.game_map.get_edge_locations(self.game_map.BOTTOM_LEFT) + self.game_map.get_edge_locations(self.game_map.BOTTOM_RIGHT)
+        if target_edges is None:
+            target_edges = [self.get_target_edge(location) for location in start_locations]
+        elif type(target_edges) == int:
+            target_edges = [target_edges] * len(start_locations)
+
+        blocked_mask = self.game_map.blocked_mask
+        paths = [None] * len(start_locations)
+        missing = []
+        for i, location in enumerate(start_locations):
+            path = self._path_cache.get((blocked_mask, location[0], location[1], target_edges[i]))
+            if path is None:
+                missing.append(i)
+            else:
+                paths[i] = path
+        if missing:
+            found = self.get_path_finder().navigate_many([start_locations[i] for i in missing], [target_edges[i] for i in missing])
+            for i, path in zip(missing, found):
+                if path is not None:
+                    self._path_cache.put((blocked_mask, start_locations[i][0], start_locations[i][1], target_edges[i]), path)
+                paths[i] = path
+
+        results = []
+        for location, target_edge, path in zip(start_locations, target_edges, paths):
+            if path is None:
+                results.append({'start': location, 'path': None, 'length': 0, 'self_destruct': False, 'end': None})
+                continue
+            end = path[-1]
+            results.append({
+                'start': location,
+                'path': [step[:] for step in path],
+                'length': len(path) - 1,
+                'self_destruct': not bitboard.bit(end) & bitboard.EDGE_MASKS[target_edge],
+                'end': end[:]})
+        return results
+
+    def get_coverage_table(self, player_index=0):
+        """Gets the table of structures covering each tile, rebuilt only when structures have changed
+
+        Args:
+            player_index: The player whose mobile units the table describes, 0 for you 1 for the enemy
+
+        Returns:
+            A CoverageTable for the current map
+
+        """
+        table = self._coverage_tables[player_index]
+        if table is None or table.version != self.game_map.structure_version:
+            table = CoverageTable(self.game_map, player_index)
+            self._coverage_tables[player_index] = table
+        return table
+
+    def get_path_profile(self, path, player_index=0):
+        """Gets how exposed a mobile unit following a path would be
+
+        Args:
+            path: A list of locations, such as the result of find_path_to_edge
+            player_index: The player controlling the unit, 0 for you 1 for the enemy
+
+        Returns:
+            A dict with the attacking turrets, damage per frame, supports and shield gained at each step of the path.
+            See CoverageTable.profile
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        return self.get_coverage_table(player_index).profile(path)
+
+    def get_threat(self, location, player_index=0):
+        """Gets the damage per frame a player's mobile unit would take at a location
+
+        Read from a heatmap GameMap keeps up to date as structures are added, upgraded and removed,
+        so no range search is needed.
+
+        Args:
+            location: The location to check
+            player_index: The player controlling the mobile unit, 0 for you 1 for the enemy
+
+        Returns:
+            The summed damage per frame of every enemy structure in range
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        return self.game_map.threat[player_index][location[0] * self.ARENA_SIZE + location[1]]
+
+    def get_threat_heatmap(self, player_index=0):
+        """Gets the damage per frame a player's mobile units would take on every tile
+
+        Args:
+            player_index: The player controlling the mobile units, 0 for you 1 for the enemy
+
+        Returns:
+            A list indexed by x * ARENA_SIZE + y. It is updated in place by later changes to the map, copy it to keep a snapshot
+
+        """
+        if not player_index == 0 and not player_index == 1:
+            self._invalid_player_index(player_index)
+            return
+        return self.game_map.threat[player_index]
+
+    def reuse_caches(self, other):
+        """Takes over the pathfinding caches of another game state, such as one prepared in the background
+
+        Cached paths are keyed on the layout of structures and the pathfinder repairs itself to match
+        this map when next used, so this is safe even when the two maps differ.
+
+        Args:
+            other: A GameState built from the same config
+
+        """
+        if other.config is not self.config:
+            self.warn("reuse_caches was passed a game state built from a different config")
+            return
+        self._path_cache = other._path_cache
+        self._dynamic_path_finder = other._dynamic_path_finder
+
+    def get_path_finder(self):
+        """Gets the incremental pathfinder, brought up to date with the structures currently on the map
+
+        Only the tiles whose structures changed since the last call are repaired, so this is cheap to
+        call between single spawns or removals.
+
+        Returns:
+            A DynamicPathFinder matching game_map
+
+        """
+        if self._dynamic_path_finder is None:
+            self._dynamic_path_finder = DynamicPathFinder(self.game_map.blocked_mask)
+        else:
+            self._dynamic_path_finder.sync(self.game_map.blocked_mask)
+        return self._dynamic_path_finder
 
     def contains_stationary_unit(self, location):
         """Check if a location is blocked, return structures unit if it is
@@ -557,7 +953,7 @@ class GameState:
 
         for unit in targets:
             location = [unit.x, unit.y]
-            if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and is_stationary(unit.unit_type)) or (attacking_unit.damage_i == 0 and not(is_stationary(unit.unit_type))) or unit.health == 0:
+            if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and self.registry.is_stationary(unit.unit_type)) or (attacking_unit.damage_i == 0 and not(self.registry.is_stationary(unit.unit_type))) or unit.health == 0:
                 continue
 
             new_target = False
@@ -628,64 +1024,32 @@ class GameState:
             self.warn("Passed a {} to get_target as attacking_unit. Expected a GameUnit.".format(type(attacking_unit)))
             return
 
-        attacker_location = [attacking_unit.x, attacking_unit.y]
-        possible_locations = self.game_map.get_locations_in_range(attacker_location, attacking_unit.attackRange)
+        # Mobile targets always win over structures, then the nearest ring wins, so rings are searched
+        # nearest first and the remaining tie breakers only compare units within one ring
+        rings = rings_in_range((attacking_unit.x, attacking_unit.y), attacking_unit.attackRange, self.game_map.get_hit_radius)
+        grid = self.game_map.get_map()
+        for stationary, can_attack in ((False, attacking_unit.damage_i != 0), (True, attacking_unit.damage_f != 0)):
+            if not can_attack:
+                continue
+            for ring in rings:
+                target = self.__best_target_in_ring(ring, grid, attacking_unit.player_index, stationary)
+                if target is not None:
+                    return target
+        return None
+
+    def __best_target_in_ring(self, ring, grid, player_index, stationary):
+        # Lowest health, then lowest y (highest for player 1), then furthest from the center column.
+        # Ties keep the first unit found, as get_locations_in_range orders them
         target = None
-        target_stationary = True
-        target_distance = sys.maxsize
-        target_health = sys.maxsize
-        target_y = self.ARENA_SIZE
-        target_x_distance = 0
-
-        for location in possible_locations:
-            for unit in self.game_map[location]:
-                if unit.player_index == attacking_unit.player_index or (attacking_unit.damage_f == 0 and is_stationary(unit.unit_type)) or (attacking_unit.damage_i == 0 and not(is_stationary(unit.unit_type))):
-                    continue
-
-                new_target = False
-                unit_stationary = unit.stationary
-                unit_distance = self.game_map.distance_between_locations(location, [attacking_unit.x, attacking_unit.y])
-                unit_health = unit.health
-                unit_y = unit.y
-                unit_x_distance = abs(self.HALF_ARENA - 0.5 - unit.x)
-
-                if target_stationary and not unit_stationary:
-                    new_target = True
-                elif not target_stationary and unit_stationary:
-                    continue
-                
-                if target_distance > unit_distance:
-                    new_target = True
-                elif target_distance < unit_distance and not new_target:
+        target_key = None
+        for x, y in ring:
+            for unit in grid[x][y]:
+                if unit.player_index == player_index or unit.stationary != stationary:
                     continue
-
-                if target_health > unit_health:
-                    new_target = True
-                elif target_health < unit_health and not new_target:
-                    continue
-
-                # Compare height heuristic relative to attacking unit's player index
-                if attacking_unit.player_index == 0:
-                    if target_y > unit_y:
-                        new_target = True
-                    elif target_y < unit_y and not new_target:
-                        continue
-                else:
-                    if target_y < unit_y:
-                        new_target = True
-                    elif target_y > unit_y and not new_target:
-                        continue
-
-                if target_x_distance < unit_x_distance:
-                    new_target = True
-                
-                if new_target:
+                key = (unit.health, unit.y if player_index == 0 else -unit.y, -abs(self.HALF_ARENA - 0.5 - unit.x))
+                if target is None or key < target_key:
                     target = unit
-                    target_stationary = unit_stationary
-                    target_distance = unit_distance
-                    target_health = unit_health
-                    target_y = unit_y
-                    target_x_distance = unit_x_distance
+                    target_key = key
         return target
 
     def get_attackers(self, location, player_index):
@@ -709,13 +1073,9 @@ class GameState:
         """
         Get locations in the range of TURRET units
         """
-        max_range = 0
-        for unit in self.config["unitInformation"]:
-            if unit.get('attackRange', 0) >= max_range:
-                max_range = unit.get('attackRange', 0)
-        possible_locations= self.game_map.get_locations_in_range(location, max_range)
-        for location_unit in possible_locations:
+        x, y = location
+        for location_unit in locations_in_range(location, self.game_map.max_attack_range, self.game_map.get_hit_radius):
             for unit in self.game_map[location_unit]:
-                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and self.game_map.distance_between_locations(location, location_unit) <= unit.attackRange:
+                if unit.damage_i + unit.damage_f > 0 and unit.player_index != player_index and math.sqrt((x - location_unit[0]) ** 2 + (y - location_unit[1]) ** 2) <= unit.attackRange:
                     attackers.append(unit)
         return attackers
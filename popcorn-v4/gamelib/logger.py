@@ -0,0 +1,122 @@
+"""
+Leveled debug logging that stays cheap inside simulation loops.
+
+Messages are a format string and its arguments, and are only formatted when they are written.
+Messages at or above the log's level are buffered and written to stderr together when the turn
+ends, see Logger.flush. Quieter messages down to the ring level are kept in a small ring buffer of
+recent detail. That buffer is only written if an exception escapes on_turn. A message below both
+levels costs one comparison.
+
+The shared log is gamelib.log:
+
+    gamelib.log.debug("frame {} of {}", frame, total)
+"""
+
+import sys
+from collections import deque
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+
+LEVEL_NAMES = {DEBUG: "DEBUG", INFO: "INFO", WARNING: "WARNING", ERROR: "ERROR"}
+
+
+def _format(message, args):
+    if not args:
+        return str(message)
+    try:
+        return message.format(*args)
+    except (IndexError, KeyError, ValueError):
+        return "{} {}".format(message, args)
+
+
+class Logger:
+    """Buffers debug messages and writes them once per turn
+
+    Arguments are kept as given until the message is written, so pass values rather than objects
+    that change before the end of the turn.
+
+    Attributes :
+        * level (int): Messages at this level or above are written when the log is flushed
+        * ring_level (int): Messages at this level or above are kept in the ring buffer, to be written
+          if the turn crashes
+        * stream: Where messages are written, stderr if None
+
+    """
+    def __init__(self, level=INFO, ring_level=DEBUG, ring_size=500, stream=None):
+        """
+        Args:
+            level: The lowest level written on flush
+            ring_level: The lowest level kept in the ring buffer
+            ring_size: How many recent messages the ring buffer holds
+            stream: Where messages are written, stderr if None
+
+        """
+        self.level = level
+        self.ring_level = ring_level
+        self.stream = stream
+        self._pending = []
+        self._ring = deque(maxlen=ring_size)
+
+    def enabled(self, level):
+        """True if a message at level would be written or kept, use it to skip building expensive arguments"""
+        return level >= self.level or level >= self.ring_level
+
+    def log(self, level, message, *args):
+        """Records a message
+
+        Args:
+            level: DEBUG, INFO, WARNING or ERROR
+            message: The message, a str.format string when args are given
+            args: The arguments of the format string
+
+        """
+        if level >= self.ring_level:
+            self._ring.append((level, message, args))
+        if level >= self.level:
+            self._pending.append((level, message, args))
+
+    def debug(self, message, *args):
+        """Records a DEBUG message, see log"""
+        self.log(DEBUG, message, *args)
+
+    def info(self, message, *args):
+        """Records an INFO message, see log"""
+        self.log(INFO, message, *args)
+
+    def warning(self, message, *args):
+        """Records a WARNING message, see log"""
+        self.log(WARNING, message, *args)
+
+    def error(self, message, *args):
+        """Records an ERROR message, see log"""
+        self.log(ERROR, message, *args)
+
+    def flush(self):
+        """Writes the buffered messages at or above level, called by AlgoCore once per turn"""
+        pending, self._pending = self._pending, []
+        if pending:
+            self._write([_format(message, args) for _, message, args in pending])
+
+    def dump_recent(self, reason=""):
+        """Writes the ring buffer of recent messages at every kept level, then empties it
+
+        Args:
+            reason: A line written before the messages, such as the exception that ended the turn
+
+        """
+        lines = ["---------------- Recent debug log: {} ----------------".format(reason)]
+        lines.extend("{} {}".format(LEVEL_NAMES.get(level, level), _format(message, args)) for level, message, args in self._ring)
+        self._ring.clear()
+        self._write(lines)
+
+    def _write(self, lines):
+        stream = self.stream or sys.stderr
+        stream.write("\n".join(line.strip() for line in lines) + "\n")
+        stream.flush()
+
+
+log = Logger()
+
@@ -1,24 +1,29 @@
 import heapq
 import math
 import sys
-import queue
+from collections import OrderedDict
 from .util import debug_write
-
-class Node:
-    """A pathfinding node
-
-    Attributes :
-        * visited_idealness (bool): Have we visited this node during the idealness search step?
-        * visited_validate (bool): Have we visited this node during the validation step?
-        * blocked (bool): Is there a structures at this node's location
-        * pathlength: The distance between this node and the target location
-
-    """
-    def __init__(self):
-        self.visited_idealness = False
-        self.visited_validate = False
-        self.blocked = False
-        self.pathlength = -1
+from .game_map import ARENA_SIZE, HALF_ARENA, IN_BOUNDS, ALL_LOCATIONS
+
+TOP_RIGHT = 0
+TOP_LEFT = 1
+BOTTOM_LEFT = 2
+BOTTOM_RIGHT = 3
+
+# Tiles are indexed x * ARENA_SIZE + y. Neighbors are listed in the same order as
+# ShortestPathFinder._get_neighbors (up, down, right, left) so tie breaking matches.
+_NEIGHBORS = [[] for _ in range(ARENA_SIZE * ARENA_SIZE)]
+for _x, _y in ALL_LOCATIONS:
+    _NEIGHBORS[_x * ARENA_SIZE + _y] = [nx * ARENA_SIZE + ny for nx, ny in
+        ((_x, _y + 1), (_x, _y - 1), (_x + 1, _y), (_x - 1, _y))
+        if 0 <= nx < ARENA_SIZE and 0 <= ny < ARENA_SIZE and IN_BOUNDS[nx * ARENA_SIZE + ny]]
+
+_EDGE_TILES = [
+    [(HALF_ARENA + n) * ARENA_SIZE + ARENA_SIZE - 1 - n for n in range(HALF_ARENA)],
+    [(HALF_ARENA - 1 - n) * ARENA_SIZE + ARENA_SIZE - 1 - n for n in range(HALF_ARENA)],
+    [(HALF_ARENA - 1 - n) * ARENA_SIZE + n for n in range(HALF_ARENA)],
+    [(HALF_ARENA + n) * ARENA_SIZE + n for n in range(HALF_ARENA)]]
+_EDGE_DIRECTIONS = [(1, 1), (-1, 1), (-1, -1), (1, -1)]
 
 """
 This class helps with pathfinding. We guarantee the results will
@@ -28,18 +33,31 @@ code to maximise time efficiency
 class ShortestPathFinder:
     """Handles pathfinding
 
+    The search state lives in flat arrays indexed x * ARENA_SIZE + y that are allocated once and
+    reused by every call. Each call takes a new generation number, and a tile only counts as blocked,
+    visited or an end point if its stamp matches the current generation, so nothing has to be reset
+    between calls.
+
     Attributes :
         * HORIZONTAL (int): A constant representing a horizontal movement
         * VERTICAL (int): A constant representing a vertical movement
 
         * game_state (:obj: GameState): The current gamestate
-        * game_map (:obj: GameMap): The current gamemap
 
     """
     def __init__(self):
         self.HORIZONTAL = 1
         self.VERTICAL = 2
         self.initialized = False
+        size = ARENA_SIZE * ARENA_SIZE
+        self._generation = 0
+        self._blocked = [0] * size
+        self._end_point = [0] * size
+        self._visited_idealness = [0] * size
+        self._visited_validate = [0] * size
+        self._pathlength = [-1] * size
+        self._queue = [0] * size
+        self._path = [0] * size
 
     def initialize_map(self, game_state):
         """Initializes the map
@@ -47,42 +65,19 @@ class ShortestPathFinder:
         Args:
             game_state: A GameState object representing the gamestate we want to traverse
         """
-        #Initialize map 
+        #Start a new generation, invalidating everything stamped by the previous call
         self.initialized = True
         self.game_state = game_state
-        self.game_map = [[Node() for x in range(self.game_state.ARENA_SIZE)] for y in range(self.game_state.ARENA_SIZE)]
-
-    def fill_walls(self, units):
-
-        for unit in units:
-
-            if self.game_state.is_stationary(unit.unit_type):
-
-                self.game_map[unit.x][unit.y].blocked = True
+        self._generation += 1
+
+    def _fill_blocked_mask(self, blocked_mask):
+        blocked = self._blocked
+        generation = self._generation
+        while blocked_mask:
+            low = blocked_mask & -blocked_mask
+            blocked_mask ^= low
+            blocked[low.bit_length() - 1] = generation
     
-    def navigate_multiple_endpoints_faster(self, start_point, end_points, game_state, units):
-        """Finds the path a unit would take to reach a set of endpoints
-
-        Args:
-            * start_point: The starting location of the unit
-            * end_points: The end points of the unit, should be a list of edge locations
-            * game_state: The current game state
-
-        Returns:
-            The path a unit at start_point would take when trying to reach end_points given the current game state.
-            Note that this path can change if a tower is destroyed during pathing, or if you or your enemy places structures.
-
-        """
-
-        #Initialize map 
-        self.initialize_map(game_state)
-        #Fill in walls
-        self.fill_walls(units)
-        #Do pathfinding
-        ideal_endpoints = self._idealness_search(start_point, end_points)
-        self._validate(ideal_endpoints, end_points)
-        return self._get_path(start_point, end_points)
-
     def navigate_multiple_endpoints(self, start_point, end_points, game_state):
         """Finds the path a unit would take to reach a set of endpoints
 
@@ -102,9 +97,7 @@ class ShortestPathFinder:
         #Initialize map 
         self.initialize_map(game_state)
         #Fill in walls
-        for location in self.game_state.game_map:
-            if self.game_state.contains_stationary_unit(location):
-                self.game_map[location[0]][location[1]].blocked = True
+        self._fill_blocked_mask(game_state.game_map.blocked_mask)
         #Do pathfinding
         ideal_endpoints = self._idealness_search(start_point, end_points)
         self._validate(ideal_endpoints, end_points)
@@ -115,30 +108,46 @@ class ShortestPathFinder:
         Finds the most ideal tile in our 'pocket' of pathable space. 
         The edge if it is available, or the best self destruct location otherwise
         """
-        current = queue.Queue()
-        current.put(start)
+        generation = self._generation
+        blocked = self._blocked
+        visited = self._visited_idealness
+        end_point = self._end_point
+        for x, y in end_points:
+            end_point[x * ARENA_SIZE + y] = generation
+        direction_x, direction_y = self._get_direction_from_endpoints(end_points)
+
+        current = self._queue
+        start_index = start[0] * ARENA_SIZE + start[1]
+        current[0] = start_index
+        head, tail = 0, 1
         best_idealness = self._get_idealness(start, end_points)
-        self.game_map[start[0]][start[1]].visited_idealness = True
-        most_ideal = start
-
-        while not current.empty():
-            search_location = current.get()
-            for neighbor in self._get_neighbors(search_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        visited[start_index] = generation
+        most_ideal = start_index
+
+        while head < tail:
+            search_location = current[head]
+            head += 1
+            for neighbor in _NEIGHBORS[search_location]:
+                if blocked[neighbor] == generation or visited[neighbor] == generation:
                     continue
 
-                x, y = neighbor
-                current_idealness = self._get_idealness(neighbor, end_points)
+                if end_point[neighbor] == generation:
+                    current_idealness = sys.maxsize
+                else:
+                    x, y = divmod(neighbor, ARENA_SIZE)
+                    current_idealness = (28 * y if direction_y == 1 else 28 * (27 - y)) + (x if direction_x == 1 else 27 - x)
 
                 if current_idealness > best_idealness:
                     best_idealness = current_idealness
                     most_ideal = neighbor
 
-                if not self.game_map[x][y].visited_idealness and not self.game_map[x][y].blocked:
-                    self.game_map[x][y].visited_idealness = True
-                    current.put(neighbor)
+                visited[neighbor] = generation
+                current[tail] = neighbor
+                tail += 1
 
-        return most_ideal
+        if most_ideal == start_index:
+            return start
+        return list(divmod(most_ideal, ARENA_SIZE))
 
     def _get_neighbors(self, location):
         """Get the locations adjacent to a location
@@ -195,129 +204,128 @@ class ShortestPathFinder:
         """
         #VALDIATION
         #Add our most ideal tiles to current
-        current = queue.Queue()
-        if ideal_tile in end_points:
-            for location in end_points:
-               current.put(location)
+        generation = self._generation
+        blocked = self._blocked
+        visited = self._visited_validate
+        pathlength = self._pathlength
+        current = self._queue
+        head, tail = 0, 0
+        ideal_index = ideal_tile[0] * ARENA_SIZE + ideal_tile[1]
+        if self._end_point[ideal_index] == generation:
+            for x, y in end_points:
+               index = x * ARENA_SIZE + y
+               if visited[index] == generation:
+                   continue
+               current[tail] = index
+               tail += 1
                #Set current pathlength to 0
-               self.game_map[location[0]][location[1]].pathlength = 0
-               self.game_map[location[0]][location[1]].visited_validate = True
+               pathlength[index] = 0
+               visited[index] = generation
         else:
-            current.put(ideal_tile)
-            self.game_map[ideal_tile[0]][ideal_tile[1]].pathlength = 0
-            self.game_map[ideal_tile[0]][ideal_tile[1]].visited_validate = True
+            current[0] = ideal_index
+            tail = 1
+            pathlength[ideal_index] = 0
+            visited[ideal_index] = generation
 
         #While current is not empty
-        while not current.empty():
-            current_location = current.get()
-            current_node = self.game_map[current_location[0]][current_location[1]]
-            for neighbor in self._get_neighbors(current_location):
-                if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        while head < tail:
+            current_location = current[head]
+            head += 1
+            if blocked[current_location] == generation:
+                continue
+            next_pathlength = pathlength[current_location] + 1
+            for neighbor in _NEIGHBORS[current_location]:
+                if blocked[neighbor] == generation or visited[neighbor] == generation:
                     continue
 
-                neighbor_node = self.game_map[neighbor[0]][neighbor[1]]
-                if not neighbor_node.visited_validate and not current_node.blocked:
-                    neighbor_node.pathlength = current_node.pathlength + 1
-                    neighbor_node.visited_validate = True
-                    current.put(neighbor)
+                pathlength[neighbor] = next_pathlength
+                visited[neighbor] = generation
+                current[tail] = neighbor
+                tail += 1
 
         #debug_write("Print after validate")
         #self.print_map()
         return
 
+    def _get_pathlength(self, index):
+        return self._pathlength[index] if self._visited_validate[index] == self._generation else -1
+
     def _get_path(self, start_point, end_points):
         """Once all nodes are validated, and a target is found, the unit can path to its target
 
         """
         #GET THE PATH
-        path = [start_point]
-        current = start_point
+        #Steps are recorded as tile indices in a reused buffer, only the returned path is allocated
+        direction = self._get_direction_from_endpoints(end_points)
+        steps = self._path
+        length = 0
+        current = start_point[0] * ARENA_SIZE + start_point[1]
         move_direction = 0
 
-        while not self.game_map[current[0]][current[1]].pathlength == 0:
-            #debug_write("current tile {} has cost {}".format(current, self.game_map[current[0]][current[1]].pathlength))
-            next_move = self._choose_next_move(current, move_direction, end_points)
-            #debug_write(next_move)
+        while not self._get_pathlength(current) == 0:
+            next_move = self._choose_next_move(current, move_direction, direction)
 
-            if current[0] == next_move[0]:
+            if current // ARENA_SIZE == next_move // ARENA_SIZE:
                 move_direction = self.VERTICAL
             else:
                 move_direction = self.HORIZONTAL
-            path.append(next_move)
+            steps[length] = next_move
+            length += 1
             current = next_move
-        
-        #debug_write(path)
+
+        path = [start_point]
+        for step in range(length):
+            path.append(list(divmod(steps[step], ARENA_SIZE)))
         return path
   
-    def _choose_next_move(self, current_point, previous_move_direction, end_points):
-        """Given the current location and adjacent locations, return the best 'next step' for a given unit to take
+    def _choose_next_move(self, current_index, previous_move_direction, direction):
+        """Given the index of the current tile, return the index of the best 'next step' for a given unit to take
         """
-        neighbors = self._get_neighbors(current_point)
-        #debug_write("Unit at {} previously moved {} and has these neighbors {}".format(current_point, previous_move_direction, neighbors))
-
-        ideal_neighbor = current_point
-        best_pathlength = self.game_map[current_point[0]][current_point[1]].pathlength
-        for neighbor in neighbors:
-            #debug_write("Comparing champ {} and contender {}".format(ideal_neighbor, neighbor))
-            if not self.game_state.game_map.in_arena_bounds(neighbor) or self.game_map[neighbor[0]][neighbor[1]].blocked:
+        generation = self._generation
+        blocked = self._blocked
+
+        ideal_neighbor = current_index
+        best_pathlength = self._get_pathlength(current_index)
+        for neighbor_index in _NEIGHBORS[current_index]:
+            if blocked[neighbor_index] == generation:
                 continue
 
-            new_best = False
-            x, y = neighbor
-            current_pathlength = self.game_map[x][y].pathlength
+            current_pathlength = self._get_pathlength(neighbor_index)
 
             #Filter by pathlength
             if current_pathlength > best_pathlength:
                 continue
-            elif current_pathlength < best_pathlength:
-                #debug_write("Contender has better pathlength at {} vs champs {}".format(current_pathlength, best_pathlength))
-                new_best = True
-
             #Filter by direction based on prev move
-            if not new_best and not self._better_direction(current_point, neighbor, ideal_neighbor, previous_move_direction, end_points):
+            if current_pathlength == best_pathlength and not self._better_direction(current_index, neighbor_index, ideal_neighbor, previous_move_direction, direction):
                 continue
 
-            ideal_neighbor = neighbor
+            ideal_neighbor = neighbor_index
             best_pathlength = current_pathlength
 
-        #debug_write("Gave unit at {} new tile {}".format(current_point, ideal_neighbor))
         return ideal_neighbor
 
-    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, end_points):
-        """Compare two tiles and return True if the unit would rather move to the new one
+    def _better_direction(self, prev_tile, new_tile, prev_best, previous_move_direction, direction):
+        """Compare two tile indices and return True if the unit would rather move to the new one
 
         """
+        prev_x, prev_y = divmod(prev_tile, ARENA_SIZE)
+        new_x, new_y = divmod(new_tile, ARENA_SIZE)
+        best_x, best_y = divmod(prev_best, ARENA_SIZE)
         #True if we are moving in a different direction than prev move and prev is not
         #If we previously moved horizontal, and now one of our options has a different x position then the other (the two options are not up/down)
-        if previous_move_direction == self.HORIZONTAL and not new_tile[0] == prev_best[0]:
+        if previous_move_direction == self.HORIZONTAL and not new_x == best_x:
             #We want to go up now. If we have not changed our y, we are not going up
-            if prev_tile[1] == new_tile[1]:
-                return False 
-            return True
-        if previous_move_direction == self.VERTICAL and not new_tile[1] == prev_best[1]:
-            if prev_tile[0] == new_tile[0]:
-                #debug_write("contender {} has the same x coord as prev tile {} so we will keep best move {}".format(new_tile, prev_tile, prev_best))
-                return False
-            return True
-        if previous_move_direction == 0: 
-            if prev_tile[1] == new_tile[1]: 
-                return False
-            return True
-        
-        #To make it here, both moves are on the same axis 
-        direction = self._get_direction_from_endpoints(end_points)
-        if new_tile[1] == prev_best[1]: #If they both moved horizontal...
-            if direction[0] == 1 and new_tile[0] > prev_best[0]: #If we moved right and right is our direction, we moved towards our direction
-                return True 
-            if direction[0] == -1 and new_tile[0] < prev_best[0]: #If we moved left and left is our direction, we moved towards our direction
-                return True 
-            return False 
-        if new_tile[0] == prev_best[0]: #If they both moved vertical...
-            if direction[1] == 1 and new_tile[1] > prev_best[1]: #If we moved up and up is our direction, we moved towards our direction
-                return True
-            if direction[1] == -1 and new_tile[1] < prev_best[1]: #If we moved down and down is our direction, we moved towards our direction
-                return True
-            return False
+            return not prev_y == new_y
+        if previous_move_direction == self.VERTICAL and not new_y == best_y:
+            return not prev_x == new_x
+        if previous_move_direction == 0:
+            return not prev_y == new_y
+
+        #To make it here, both moves are on the same axis
+        if new_y == best_y: #If they both moved horizontal, prefer the one towards our direction
+            return (direction[0] == 1 and new_x > best_x) or (direction[0] == -1 and new_x < best_x)
+        if new_x == best_x: #If they both moved vertical, prefer the one towards our direction
+            return (direction[1] == 1 and new_y > best_y) or (direction[1] == -1 and new_y < best_y)
         return True
 
     def print_map(self):
@@ -330,9 +338,10 @@ class ShortestPathFinder:
 
         for y in range(28):
             for x in range(28):
-                node = self.game_map[x][28 - y - 1]
-                if not node.blocked and not node.pathlength == -1:
-                    self._print_justified(node.pathlength)
+                index = x * ARENA_SIZE + 28 - y - 1
+                pathlength = self._get_pathlength(index)
+                if not self._blocked[index] == self._generation and not pathlength == -1:
+                    self._print_justified(pathlength)
                 else:
                     sys.stderr.write("   ")
             debug_write("")
@@ -345,3 +354,358 @@ class ShortestPathFinder:
             sys.stderr.write(" ")
         sys.stderr.write(str(number))
         sys.stderr.write(" ")
+
+
+class DynamicPathFinder:
+    """Pathfinder that keeps its distance fields up to date as single tiles change
+
+    One distance field is kept per target edge, holding the number of steps from each tile
+    to the nearest open tile on that edge. A field is built the first time its edge is queried,
+    and afterwards only the tiles whose distance actually changes are touched when a structure
+    is added or removed. Paths are identical to the ones ShortestPathFinder returns for edges.
+
+    Attributes :
+        * blocked_mask (int): Bitset of blocked tiles, bit x * 28 + y is set if [x, y] holds a structure
+
+    """
+    def __init__(self, blocked_mask=0):
+        """Creates a pathfinder for the given blocked tiles
+
+        Args:
+            blocked_mask: Bitset of blocked tiles, see GameMap.blocked_mask
+
+        """
+        self.HORIZONTAL = 1
+        self.VERTICAL = 2
+        self.blocked_mask = 0
+        self._blocked = bytearray(ARENA_SIZE * ARENA_SIZE)
+        self._fields = [None, None, None, None]
+        self.sync(blocked_mask)
+
+    def __deepcopy__(self, memo):
+        other = DynamicPathFinder.__new__(DynamicPathFinder)
+        other.HORIZONTAL = self.HORIZONTAL
+        other.VERTICAL = self.VERTICAL
+        other.blocked_mask = self.blocked_mask
+        other._blocked = bytearray(self._blocked)
+        other._fields = [None if field is None else list(field) for field in self._fields]
+        return other
+
+    def sync(self, blocked_mask):
+        """Brings the pathfinder up to date with a new set of blocked tiles, repairing only the tiles that differ
+
+        Args:
+            blocked_mask: Bitset of blocked tiles, see GameMap.blocked_mask
+
+        """
+        changed = self.blocked_mask ^ blocked_mask
+        while changed:
+            low = changed & -changed
+            changed ^= low
+            index = low.bit_length() - 1
+            if blocked_mask & low:
+                self._block(index)
+            else:
+                self._unblock(index)
+
+    def block(self, location):
+        """Marks a location as holding a structure
+
+        Args:
+            location: The [x, y] location that became blocked
+
+        """
+        self._block(location[0] * ARENA_SIZE + location[1])
+
+    def unblock(self, location):
+        """Marks a location as free of structures
+
+        Args:
+            location: The [x, y] location that became free
+
+        """
+        self._unblock(location[0] * ARENA_SIZE + location[1])
+
+    def distance_to_edge(self, location, target_edge):
+        """Gets the number of steps between a location and the target edge
+
+        Args:
+            location: An [x, y] location
+            target_edge: game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            The number of steps to the closest open edge tile, or -1 if the edge cannot be reached
+
+        """
+        return self._field(target_edge)[location[0] * ARENA_SIZE + location[1]]
+
+    def navigate(self, start_point, target_edge):
+        """Finds the path a unit would take to reach an edge
+
+        Args:
+            * start_point: The starting location of the unit
+            * target_edge: The edge the unit wants to reach, game_map.TOP_LEFT, game_map.BOTTOM_RIGHT, etc.
+
+        Returns:
+            The path a unit at start_point would take, ending in a self destruct location if the edge cannot be
+            reached. None if start_point is blocked.
+
+        """
+        start = start_point[0] * ARENA_SIZE + start_point[1]
+        if self._blocked[start]:
+            return
+        distances = self._field(target_edge)
+        if distances[start] < 0:
+            distances = self._pocket_field(start, target_edge)
+        return self._get_path(start, distances, _EDGE_DIRECTIONS[target_edge])
+
+    def navigate_many(self, start_points, target_edges):
+        """Finds the paths of several units at once
+
+        Starts heading for the same edge share that edge's distance field, and starts in the same
+        pocket share its self destruct search, so the cost is one search per pocket rather than per start.
+
+        Args:
+            * start_points: A list of starting locations
+            * target_edges: A list with the edge each unit wants to reach, one per start point
+
+        Returns:
+            A list with the path of each unit, see navigate. None for blocked start points.
+
+        """
+        pockets = {}
+        paths = []
+        for start_point, target_edge in zip(start_points, target_edges):
+            start = start_point[0] * ARENA_SIZE + start_point[1]
+            if self._blocked[start]:
+                paths.append(None)
+                continue
+            distances = self._field(target_edge)
+            if distances[start] < 0:
+                distances = pockets.get((start, target_edge))
+                if distances is None:
+                    distances = self._pocket_field(start, target_edge)
+                    for index in distances:
+                        pockets[(index, target_edge)] = distances
+            paths.append(self._get_path(start, distances, _EDGE_DIRECTIONS[target_edge]))
+        return paths
+
+    def _field(self, target_edge):
+        field = self._fields[target_edge]
+        if field is None:
+            field = [-1] * (ARENA_SIZE * ARENA_SIZE)
+            current = [index for index in _EDGE_TILES[target_edge] if not self._blocked[index]]
+            for index in current:
+                field[index] = 0
+            self._fill(field, current)
+            self._fields[target_edge] = field
+        return field
+
+    def _fill(self, field, current):
+        """Breadth first search outwards from current, lowering pathlengths that are improved"""
+        blocked = self._blocked
+        while current:
+            following = []
+            for index in current:
+                pathlength = field[index] + 1
+                for neighbor in _NEIGHBORS[index]:
+                    if not blocked[neighbor] and (field[neighbor] < 0 or field[neighbor] > pathlength):
+                        field[neighbor] = pathlength
+                        following.append(neighbor)
+            current = following
+
+    def _block(self, index):
+        if self._blocked[index]:
+            return
+        self._blocked[index] = 1
+        self.blocked_mask |= 1 << index
+        for field in self._fields:
+            if field is not None and field[index] >= 0:
+                self._repair_blocked(field, index)
+
+    def _unblock(self, index):
+        if not self._blocked[index]:
+            return
+        self._blocked[index] = 0
+        self.blocked_mask &= ~(1 << index)
+        for target_edge, field in enumerate(self._fields):
+            if field is None:
+                continue
+            if index in _EDGE_TILES[target_edge]:
+                field[index] = 0
+            else:
+                for neighbor in _NEIGHBORS[index]:
+                    if field[neighbor] >= 0 and (field[index] < 0 or field[neighbor] + 1 < field[index]):
+                        field[index] = field[neighbor] + 1
+            if field[index] >= 0:
+                self._fill(field, [index])
+
+    def _repair_blocked(self, field, index):
+        """Recomputes the tiles whose every shortest path ran through a newly blocked tile"""
+        # Walk outwards level by level, collecting tiles left without a neighbor one step closer to the edge.
+        lost = {index}
+        current = [index]
+        while current:
+            following = []
+            for tile in current:
+                pathlength = field[tile] + 1
+                for neighbor in _NEIGHBORS[tile]:
+                    if field[neighbor] != pathlength or neighbor in lost:
+                        continue
+                    for support in _NEIGHBORS[neighbor]:
+                        if field[support] == pathlength - 1 and support not in lost:
+                            break
+                    else:
+                        lost.add(neighbor)
+                        following.append(neighbor)
+            current = following
+
+        for tile in lost:
+            field[tile] = -1
+        lost.discard(index)
+
+        # Re-enter the lost region from its boundary, closest tiles first
+        frontier = []
+        for tile in lost:
+            best = -1
+            for neighbor in _NEIGHBORS[tile]:
+                if field[neighbor] >= 0 and (best < 0 or field[neighbor] + 1 < best):
+                    best = field[neighbor] + 1
+            if best >= 0:
+                frontier.append((best, tile))
+        heapq.heapify(frontier)
+        while frontier:
+            pathlength, tile = heapq.heappop(frontier)
+            if field[tile] >= 0:
+                continue
+            field[tile] = pathlength
+            for neighbor in _NEIGHBORS[tile]:
+                if field[neighbor] < 0 and neighbor in lost:
+                    heapq.heappush(frontier, (pathlength + 1, neighbor))
+
+    def _pocket_field(self, start, target_edge):
+        """Pathlengths towards the best self destruct location of a pocket that cannot reach the edge"""
+        blocked = self._blocked
+        direction_x, direction_y = _EDGE_DIRECTIONS[target_edge]
+        pocket = {start}
+        current = [start]
+        while current:
+            following = []
+            for index in current:
+                for neighbor in _NEIGHBORS[index]:
+                    if not blocked[neighbor] and neighbor not in pocket:
+                        pocket.add(neighbor)
+                        following.append(neighbor)
+            current = following
+
+        def idealness(index):
+            x, y = divmod(index, ARENA_SIZE)
+            return (28 * y if direction_y == 1 else 28 * (27 - y)) + (x if direction_x == 1 else 27 - x)
+
+        ideal = max(pocket, key=idealness)
+        distances = {ideal: 0}
+        current = [ideal]
+        while current:
+            following = []
+            for index in current:
+                for neighbor in _NEIGHBORS[index]:
+                    if not blocked[neighbor] and neighbor not in distances:
+                        distances[neighbor] = distances[index] + 1
+                        following.append(neighbor)
+            current = following
+        return distances
+
+    def _get_path(self, start, distances, direction):
+        """Follows decreasing pathlengths from start, breaking ties the same way ShortestPathFinder does
+
+        """
+        blocked = self._blocked
+        x, y = divmod(start, ARENA_SIZE)
+        path = [[x, y]]
+        index = start
+        move_direction = 0
+
+        while not distances[index] == 0:
+            best_index = index
+            best_pathlength = distances[index]
+            for neighbor in _NEIGHBORS[index]:
+                if blocked[neighbor]:
+                    continue
+                pathlength = distances[neighbor]
+                if pathlength > best_pathlength:
+                    continue
+                if pathlength == best_pathlength and not self._better_direction(index, neighbor, best_index, move_direction, direction):
+                    continue
+                best_index = neighbor
+                best_pathlength = pathlength
+
+            if best_index // ARENA_SIZE == index // ARENA_SIZE:
+                move_direction = self.VERTICAL
+            else:
+                move_direction = self.HORIZONTAL
+            index = best_index
+            path.append(list(divmod(index, ARENA_SIZE)))
+        return path
+
+    _better_direction = ShortestPathFinder._better_direction
+
+
+class PathCache:
+    """Bounded least recently used cache of paths
+
+    Keys include the full blocked layout (GameMap.blocked_mask), so an entry can never be returned
+    for a map whose structures differ from the one it was computed on. Because of that the cache is
+    safe to share between copies of a GameState, and deep copies return the same cache.
+
+    Attributes :
+        * max_size (int): The number of paths kept before the least recently used one is evicted
+        * hits (int): The number of lookups answered from the cache
+        * misses (int): The number of lookups that were not
+
+    """
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._paths = OrderedDict()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __len__(self):
+        return len(self._paths)
+
+    def get(self, key):
+        """Gets a cached path, marking it as recently used
+
+        Args:
+            key: A (blocked_mask, x, y, target_edge) tuple
+
+        Returns:
+            The cached path, or None if there is none
+
+        """
+        path = self._paths.get(key)
+        if path is None:
+            self.misses += 1
+            return
+        self.hits += 1
+        self._paths.move_to_end(key)
+        return path
+
+    def put(self, key, path):
+        """Stores a path, evicting the least recently used one if the cache is full
+
+        Args:
+            key: A (blocked_mask, x, y, target_edge) tuple
+            path: The path to store
+
+        """
+        self._paths[key] = path
+        self._paths.move_to_end(key)
+        if len(self._paths) > self.max_size:
+            self._paths.popitem(last=False)
+
+    def clear(self):
+        """Empties the cache"""
+        self._paths.clear()
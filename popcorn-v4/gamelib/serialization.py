@@ -0,0 +1,103 @@
+"""
+Compact binary encoding of a GameState, for sending a turn to another process or caching it.
+
+The encoding holds the turn number, health, time and resources of both players, every unit on
+the map and the build and deploy stacks. The config is not included, pass the same config to
+decode. A turn with a hundred units encodes to under 2 KB.
+"""
+
+import struct
+
+from .game_state import GameState
+from .unit import GameUnit
+
+VERSION = 1
+
+# version, turn number, then health, time, SP and MP of both players, then the unit, build stack and deploy stack counts
+_HEADER = struct.Struct("<HI8dHHH")
+# x, y, type id, flags, target edge, health
+_UNIT = struct.Struct("<BBBBBd")
+# type id, x, y
+_STACK_ENTRY = struct.Struct("<BBB")
+
+_OWNER_FLAG = 1
+_UPGRADED_FLAG = 2
+_PENDING_REMOVAL_FLAG = 4
+_NO_TARGET_EDGE = 255
+
+
+def encode(game_state):
+    """Encodes a game state as bytes
+
+    Args:
+        game_state: The GameState to encode
+
+    Returns:
+        A bytes object that decode turns back into an equivalent GameState
+
+    """
+    registry = game_state.registry
+    units = []
+    grid = game_state.game_map.get_map()
+    for x, y in game_state.game_map:
+        for unit in grid[x][y]:
+            flags = ((_OWNER_FLAG if unit.player_index == 1 else 0) |
+                     (_UPGRADED_FLAG if unit.upgraded else 0) |
+                     (_PENDING_REMOVAL_FLAG if unit.pending_removal else 0))
+            target_edge = _NO_TARGET_EDGE if unit.target_edge is None else unit.target_edge
+            units.append(_UNIT.pack(x, y, registry.UNIT_TYPE_TO_INDEX[unit.unit_type], flags, target_edge, unit.health))
+
+    resources = game_state._player_resources
+    header = _HEADER.pack(
+        VERSION, game_state.turn_number,
+        game_state.my_health, game_state.my_time, game_state.enemy_health, game_state.enemy_time,
+        resources[0]['SP'], resources[0]['MP'], resources[1]['SP'], resources[1]['MP'],
+        len(units), len(game_state._build_stack), len(game_state._deploy_stack))
+    stacks = [_STACK_ENTRY.pack(registry.UNIT_TYPE_TO_INDEX[unit_type], x, y)
+              for unit_type, x, y in game_state._build_stack + game_state._deploy_stack]
+    return b"".join([header] + units + stacks)
+
+
+def decode(config, data):
+    """Rebuilds a game state from the output of encode
+
+    Args:
+        config (JSON): The config the game state was created with
+        data: The bytes returned by encode
+
+    Returns:
+        A GameState with the same map, resources and stacks as the encoded one
+
+    """
+    (version, turn_number, my_health, my_time, enemy_health, enemy_time,
+     my_SP, my_MP, enemy_SP, enemy_MP, unit_count, build_count, deploy_count) = _HEADER.unpack_from(data, 0)
+    if version != VERSION:
+        raise ValueError("Cannot decode game state encoding version {}, expected {}".format(version, VERSION))
+
+    game_state = GameState(config, {
+        "turnInfo": [0, turn_number, -1],
+        "p1Stats": [my_health, my_SP, my_MP, my_time],
+        "p2Stats": [enemy_health, enemy_SP, enemy_MP, enemy_time],
+        "p1Units": [],
+        "p2Units": []})
+    game_map = game_state.game_map
+    unit_information = config["unitInformation"]
+
+    offset = _HEADER.size
+    for _ in range(unit_count):
+        x, y, type_id, flags, target_edge, health = _UNIT.unpack_from(data, offset)
+        offset += _UNIT.size
+        unit = GameUnit(unit_information[type_id]["shorthand"], config, 1 if flags & _OWNER_FLAG else 0, health, x, y,
+                        None if target_edge == _NO_TARGET_EDGE else target_edge)
+        unit.health = health
+        unit.pending_removal = bool(flags & _PENDING_REMOVAL_FLAG)
+        game_map._place_unit(unit)
+        if flags & _UPGRADED_FLAG:
+            game_map._upgrade_unit(unit)
+
+    for stack, count in ((game_state._build_stack, build_count), (game_state._deploy_stack, deploy_count)):
+        for _ in range(count):
+            type_id, x, y = _STACK_ENTRY.unpack_from(data, offset)
+            offset += _STACK_ENTRY.size
+            stack.append((unit_information[type_id]["shorthand"], x, y))
+    return game_state
@@ -1,7 +1,25 @@
 import unittest
+import copy
 import json
+import random
+import io
+import time
+import gc
+import weakref
 from .game_state import GameState
-from .unit import GameUnit
+from .unit import GameUnit, UnitRegistry
+from .navigation import ShortestPathFinder
+from . import bitboard, game_map, serialization
+from .algocore import AlgoCore, decode_section
+from .background import BackgroundTask
+from . import budget, logger
+from . import game_state as game_state_module
+from .workers import WorkerPool
+
+def _slow_task(game_state, seconds):
+    time.sleep(seconds)
+    return seconds
+
 
 class BasicTests(unittest.TestCase):
 
@@ -192,6 +210,18 @@ class BasicTests(unittest.TestCase):
         state.suppress_warnings(True)
         return state
 
+    def test_lazy_units(self):
+        config = self.make_turn_0_map().config
+        turn = {"p2Units": [[], [], [[13, 16, 60.0, "1"]], [], [], [], [], []], "turnInfo": [0, 3, -1],
+                "p1Stats": [28.0, 12.0, 7.0, 1500], "p1Units": [[[13, 2, 20.0, "2"]], [], [], [], [], [], [], [[13, 2, 0, "3"]]],
+                "p2Stats": [30.0, 9.0, 4.0, 900], "events": {}}
+        game = GameState(config, turn)
+        self.assertEqual((3, 28.0, [12.0, 7.0]), (game.turn_number, game.my_health, game.get_resources()))
+        self.assertIsNone(game._game_map, "Units should not be built until the map is used")
+        self.assertTrue(game.game_map[13, 2][0].upgraded)
+        self.assertEqual(1, game.game_map.count_structures(1, "DF"))
+        self.assertEqual(game.game_map.blocked_mask, GameState(config, json.dumps(turn)).game_map.blocked_mask)
+
     def test_basic(self):
         self.assertEqual(True, True, "It's the end of the world as we know it, and I feel fine")
 
@@ -275,3 +305,506 @@ class BasicTests(unittest.TestCase):
         actual = game.project_future_MP(turns)
         self.assertAlmostEqual(actual, expected, 0, "Expected {} MP {} turns from now, got {}".format(expected, turns, actual))
 
+
+    def test_dynamic_pathing(self):
+        game = self.make_turn_0_map()
+        rng = random.Random(26)
+        locations = [location for location in game.game_map]
+        starts = [[13, 0], [14, 0], [3, 10], [24, 10], [13, 27], [0, 14], [27, 13]]
+        for step in range(200):
+            location = rng.choice(locations)
+            if game.contains_stationary_unit(location):
+                game.game_map.remove_unit(location)
+            else:
+                game.game_map.add_unit("FF", location, rng.randint(0, 1))
+            if step % 10:
+                continue
+            for start in starts:
+                for edge in range(4):
+                    if game.contains_stationary_unit(start):
+                        continue
+                    end_points = game.game_map.get_edge_locations(edge)
+                    expected = ShortestPathFinder().navigate_multiple_endpoints(start, end_points, game)
+                    self.assertEqual(expected, game.find_path_to_edge(start, edge), "Incremental pathing diverged from a full search")
+
+    def test_path_cache(self):
+        game = self.make_turn_0_map()
+        path = game.find_path_to_edge([13, 0])
+        path[0][0] = -1
+        self.assertEqual([13, 0], game.find_path_to_edge([13, 0])[0], "Cached paths should not be shared with callers")
+        self.assertEqual(1, game._path_cache.hits, "The second lookup should come from the cache")
+
+        game.game_map.add_unit("FF", [13, 1])
+        blocked = game.find_path_to_edge([13, 0])
+        self.assertNotIn([13, 1], blocked, "Adding a structure should invalidate the cached path")
+        game.game_map.remove_unit([13, 1])
+        self.assertEqual(game.find_path_to_edge([13, 0]), game.find_path_to_edge([13, 0], game.game_map.TOP_RIGHT))
+
+    def test_bitboard(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(420, bitboard.count(bitboard.ARENA_MASK), "The arena should have 420 tiles")
+        for x in range(28):
+            game.game_map.add_unit("FF", [x, 13], 1)
+        game.game_map.add_unit("DF", [20, 5], 0)
+        self.assertEqual(bitboard.mask_from_locations([[20, 5]]), game.game_map.structure_masks[0])
+        self.assertEqual(28, bitboard.count(game.game_map.structure_masks[1]))
+
+        blocked = game.game_map.blocked_mask
+        self.assertFalse(bitboard.can_reach_edge([13, 0], game.game_map.TOP_LEFT, blocked), "The wall should cut off the top left edge")
+        self.assertTrue(bitboard.can_reach_edge([13, 0], game.game_map.BOTTOM_RIGHT, blocked))
+        pocket = bitboard.locations_from_mask(bitboard.pocket([13, 0], blocked))
+        self.assertEqual(sorted([x, y] for x, y in game.game_map if y < 13), pocket, "Wrong pocket behind the wall")
+
+        in_range = game.game_map.get_locations_in_range([13, 13], 3.5)
+        self.assertEqual(bitboard.mask_from_locations(in_range), bitboard.range_mask([13, 13], 3.5, 0.01))
+
+    def test_batch_paths(self):
+        game = self.make_turn_0_map()
+        for x in range(14, 20):
+            game.game_map.add_unit("FF", [x, 5])
+        for y in range(0, 6):
+            game.game_map.add_unit("FF", [13, y])
+        results = game.find_paths_to_edges()
+        self.assertEqual(28, len(results), "There should be one result per deploy location")
+        for result in results:
+            start = result['start']
+            if game.contains_stationary_unit(start):
+                self.assertIsNone(result['path'])
+                continue
+            path = game.find_path_to_edge(start)
+            self.assertEqual(path, result['path'], "Batch pathing diverged from find_path_to_edge")
+            self.assertEqual(len(path) - 1, result['length'])
+            self.assertEqual(path[-1], result['end'])
+            self.assertEqual(path[-1] not in game.game_map.get_edge_locations(game.get_target_edge(start)), result['self_destruct'])
+        self.assertEqual([[14, 0], [15, 1], [16, 2], [17, 3], [18, 4]], [result['start'] for result in results if result['self_destruct']], "Units behind the wall should self destruct")
+
+    def test_path_profile(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [24, 15], 1)
+        game.game_map.add_unit("DF", [25, 16], 1)
+        game.game_map.add_unit("EF", [19, 5], 0)
+        path = game.find_path_to_edge([13, 0])
+        profile = game.get_path_profile(path)
+        for step, location in enumerate(path):
+            attackers = [unit for unit in game.get_attackers(location, 0) if unit.stationary]
+            self.assertEqual(sorted(map(id, attackers)), sorted(map(id, profile['attackers'][step])), "Wrong attackers at {}".format(location))
+            self.assertEqual(sum(unit.damage_i for unit in attackers), profile['damage'][step])
+        self.assertEqual(sum(profile['damage']), profile['total_damage'])
+        self.assertGreater(profile['total_damage'], 0, "The path should be covered by turrets")
+
+        game.game_map.add_unit("DF", [25, 15], 1)
+        self.assertGreater(game.get_path_profile(path)['total_damage'], profile['total_damage'], "The coverage table should be rebuilt after structures change")
+
+    def test_location_tables(self):
+        game = self.make_turn_0_map()
+        locations = [location for location in game.game_map]
+        self.assertEqual(420, len(locations), "The arena should have 420 tiles")
+        self.assertEqual([13, 0], locations[0])
+        self.assertEqual([14, 27], locations[-1])
+        pairs = sum(1 for _ in game.game_map for _ in game.game_map)
+        self.assertEqual(420 * 420, pairs, "Nested iteration over the map should be independent")
+        self.assertEqual(sorted(game_map.BOTTOM_HALF_LOCATIONS + game_map.TOP_HALF_LOCATIONS), sorted(game_map.ALL_LOCATIONS))
+        self.assertEqual(420, sum(len(quadrant) for quadrant in game_map.QUADRANT_LOCATIONS))
+        self.assertEqual(7, game_map.LOCATION_TO_INDEX[(12, 2)])
+
+    def test_range_stencils(self):
+        game = self.make_turn_0_map()
+        self.assertEqual(37, len(game_map.range_stencil(3.5, 0.01)), "Wrong number of offsets in range")
+        self.assertIn((3, 0), game_map.range_stencil(3), "Without a hit radius tiles exactly in range should count")
+        self.assertNotIn((3, 0), game_map.range_stencil(3, 0))
+        corner = game.game_map.get_locations_in_range([0, 13], 3.5)
+        self.assertTrue(all(game.game_map.in_arena_bounds(location) for location in corner), "Stencils should be clipped to the arena")
+        self.assertEqual(sorted(corner), sorted(location for location in game.game_map if game.game_map.distance_between_locations(location, [0, 13]) < 3.51))
+
+        game.game_map.add_unit("DF", [13, 16], 1)
+        self.assertEqual(0, len(game.get_attackers([13, 13], 0)), "A turret 3 tiles away should be out of range")
+        game.game_map[13, 16][0].upgrade()
+        self.assertEqual(1, len(game.get_attackers([13, 13], 0)), "The upgraded turret should reach 3.5 tiles")
+        self.assertEqual(0, len(game.get_attackers([13, 12], 0)))
+
+    def test_structure_index(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [3, 14], 1)
+        game.game_map.add_unit("DF", [10, 20], 1)
+        game.game_map.add_unit("FF", [4, 14], 1)
+        game.game_map.add_unit("DF", [13, 10], 0)
+        self.assertEqual(2, game.game_map.count_structures(1, "DF"))
+        self.assertEqual(1, game.game_map.count_structures(1, "DF", bitboard.region_mask(0, 5)), "Only one enemy turret has x in [0, 5]")
+        self.assertEqual(3, game.game_map.count_structures(1))
+        self.assertEqual([[13, 10]], [[unit.x, unit.y] for unit in game.game_map.get_structures(0)])
+
+        health = game.game_map[3, 14][0].health
+        self.assertEqual(2 * health, game.game_map.get_structure_health(1, "DF"))
+
+        game.attempt_upgrade([13, 10])
+        self.assertEqual(1, game.game_map.count_structures(0, "DF", upgraded=True))
+        game.game_map.remove_unit([3, 14])
+        game.game_map.add_unit("FF", [10, 20], 1)
+        self.assertEqual(0, game.game_map.count_structures(1, "DF"), "Replaced and removed turrets should leave the index")
+        self.assertEqual(2, game.game_map.count_structures(1, "FF"))
+        self.assertEqual(0, game.game_map.get_structure_health(1, "DF"))
+
+    def test_checkpoint_rollback(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("FF", [13, 2], 0)
+        resources = game.get_resources()
+        blocked_mask = game.game_map.blocked_mask
+        path = game.find_path_to_edge([13, 0])
+
+        game.checkpoint()
+        game.attempt_spawn("DF", [[13, 1], [14, 1]])
+        game.attempt_upgrade([13, 2])
+        game.attempt_remove([13, 2])
+        game.attempt_spawn("PI", [13, 0], 2)
+        game.checkpoint()
+        game.game_map.remove_unit([13, 1])
+        self.assertTrue(game.rollback())
+        self.assertEqual(1, len(game.game_map[13, 1]), "Rolling back the inner checkpoint should restore the turret")
+        self.assertTrue(game.rollback())
+
+        self.assertEqual(resources, game.get_resources())
+        self.assertEqual(blocked_mask, game.game_map.blocked_mask)
+        self.assertEqual([], game.game_map[13, 1])
+        self.assertEqual([], game.game_map[13, 0])
+        self.assertFalse(game.game_map[13, 2][0].upgraded, "The upgrade should be undone")
+        self.assertEqual(0, game.game_map.count_structures(0, "DF"))
+        self.assertEqual([], game._build_stack)
+        self.assertEqual([], game._deploy_stack)
+        self.assertEqual(path, game.find_path_to_edge([13, 0]))
+        self.assertIsNone(game.game_map._undo_log, "Logging should stop once every checkpoint is closed")
+
+    def test_board_arrays(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [3, 14], 1)
+        game.game_map.add_unit("DF", [20, 14], 1)
+        game.game_map.add_unit("FF", [13, 2], 0)
+        board = game.game_map.board
+        index = 3 * 28 + 14
+        self.assertEqual((1, 2, 1), (board.occupied[index], board.unit_type[index], board.owner[index]))
+        health = game.game_map[3, 14][0].health
+        self.assertEqual(health, board.total_health(1, "DF", bitboard.region_mask(0, 13)), "Only the left turret should be counted")
+        self.assertEqual(2 * health, board.total_health(1, "DF"))
+
+        game.attempt_upgrade([13, 2])
+        self.assertEqual(1, board.upgraded[13 * 28 + 2])
+        game.game_map.remove_unit([3, 14])
+        self.assertEqual((0, -1, -1, 0.0), (board.occupied[index], board.unit_type[index], board.owner[index], board.health[index]))
+        self.assertEqual(sum(board.occupied), bitboard.count(game.game_map.blocked_mask))
+        self.assertEqual(health, board.total_health(1, "DF"), "Removed structures should not be counted")
+        self.assertEqual(game.game_map.get_structure_health(1), board.total_health(1))
+        copy_map = copy.deepcopy(game.game_map)
+        copy_map.remove_unit([20, 14])
+        self.assertEqual(0, copy_map.board.total_health(1), "A copied board should read the masks of its own map")
+        self.assertEqual(health, board.total_health(1))
+
+    def test_threat_heatmap(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 16], 1)
+        game.game_map.add_unit("DF", [15, 15], 1)
+        game.game_map.add_unit("DF", [13, 10], 0)
+        game.game_map.add_unit("FF", [12, 10], 0)
+        turret = game.game_map[13, 16][0]
+        self.assertEqual(2 * turret.damage_i, game.get_threat([14, 14], 0))
+        self.assertEqual(len(game.get_attackers([13, 13], 0)) * turret.damage_i, game.get_threat([13, 13], 0))
+
+        game.attempt_upgrade([13, 10])
+        game.game_map.remove_unit([15, 15])
+        for player_index in (0, 1):
+            heatmap = game.get_threat_heatmap(player_index)
+            for x, y in game.game_map:
+                self.assertEqual(sum(unit.damage_i for unit in game.get_attackers([x, y], player_index)), heatmap[x * 28 + y],
+                                 "Heatmap disagrees with get_attackers at {}".format([x, y]))
+            self.assertEqual(heatmap, game.get_coverage_table(player_index).damage, "Coverage damage should match the heatmap")
+
+    def test_edge_tables(self):
+        game = self.make_turn_0_map()
+        edges = game.game_map.get_edges()
+        for x, y in game.game_map:
+            on_edges = [edge for edge in range(4) if [x, y] in edges[edge]]
+            self.assertEqual(on_edges[0] if on_edges else -1, game_map.EDGE_OF[x * 28 + y])
+            self.assertEqual(((on_edges[0] if on_edges else 0) + 2) % 4, game.game_map.spawn_loc_to_target_edge([x, y]))
+        self.assertTrue(game.can_spawn("PI", [0, 13]))
+        self.assertFalse(game.can_spawn("PI", [13, 1]), "Mobile units must be deployed on a bottom edge")
+        self.assertFalse(game.can_spawn("PI", [0, 14]))
+
+    def test_shared_unit_stats(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 2], 0)
+        game.game_map.add_unit("DF", [14, 2], 0)
+        first, second = game.game_map[13, 2][0], game.game_map[14, 2][0]
+        self.assertIs(first.stats, second.stats, "Units of one type should share their stats")
+        self.assertFalse(hasattr(first, "__dict__"))
+        self.assertEqual(2.5, first.attackRange)
+
+        game.game_map._upgrade_unit(first)
+        self.assertEqual(3.5, first.attackRange)
+        self.assertEqual(2.5, second.attackRange, "Upgrading one unit should not change the others")
+        self.assertEqual(first.cost, [second.cost[0] + game.config["unitInformation"][2]["upgrade"].get("cost1", 0), second.cost[1]])
+        self.assertIs(first.stats, copy.deepcopy(first).stats)
+
+    def test_unit_registry(self):
+        game = self.make_turn_0_map()
+        registry = game.registry
+        self.assertIs(registry, UnitRegistry.for_config(game.config))
+        self.assertEqual(("FF", "EF", "DF"), registry.STRUCTURE_TYPES)
+        self.assertEqual([True, True, True, False, False, False], list(registry.is_structure[:6]))
+        self.assertEqual(2, registry.UNIT_TYPE_TO_INDEX["DF"])
+
+        other_config = copy.deepcopy(game.config)
+        other_config["unitInformation"][2]["attackRange"] = 6.5
+        other = GameState(other_config, game.serialized_string)
+        self.assertIsNot(registry, other.registry)
+        other.game_map.add_unit("DF", [13, 2], 0)
+        game.game_map.add_unit("DF", [13, 2], 0)
+        self.assertEqual(6.5, other.game_map[13, 2][0].attackRange)
+        self.assertEqual(2.5, game.game_map[13, 2][0].attackRange, "Configs should not leak into each other")
+        self.assertTrue(game.is_stationary("DF") and not game.is_stationary("PI"))
+        self.assertTrue(game_state_module.is_stationary("DF", other.registry) and not game_state_module.is_stationary("PI", registry))
+        self.assertTrue(game_state_module.is_stationary("EF") and not game_state_module.is_stationary("SI"), "Without a registry the standard shorthands should be used")
+        self.assertFalse(registry.is_stationary("RM"))
+
+        cached = len(UnitRegistry._by_config)
+        for _ in range(20):
+            copied = copy.deepcopy(game)
+            copied.attempt_spawn("PI", [13, 0])
+            self.assertIs(game.config, copied.config)
+            self.assertIs(registry, copied.registry, "Copies should share the registry of their config")
+            self.assertIs(game.game_map[13, 2][0].stats, copied.game_map[13, 2][0].stats)
+        self.assertLessEqual(len(UnitRegistry._by_config), cached, "Copies should not add registries")
+        other_registry = weakref.ref(other.registry)
+        del other, other_config
+        gc.collect()
+        self.assertIsNone(other_registry(), "Registries of unused configs should be dropped")
+
+    def test_attempt_build(self):
+        game = self.make_turn_0_map()
+        plan = [("DF", [13, 2]), ("FF", [13, 2]), ("FF", [14, 2]), (game.UPGRADE, [13, 2]), ("PI", [13, 0], 2),
+                ("PI", [13, 5]), ("FF", [13, 20]), (game.REMOVE, [14, 2]), (game.REMOVE, [10, 10])]
+        plan += [("FF", [x, 13]) for x in range(0, 28)]
+
+        sequential = copy.deepcopy(game)
+        for item in plan:
+            if item[0] == game.UPGRADE:
+                sequential.attempt_upgrade(item[1])
+            elif item[0] == game.REMOVE:
+                if sequential.game_map.in_arena_bounds(item[1]):
+                    sequential.attempt_remove(item[1])
+            else:
+                sequential.attempt_spawn(item[0], item[1], item[2] if len(item) > 2 else 1)
+
+        batch = copy.deepcopy(game)
+        result = batch.attempt_build(plan, stop_when_unaffordable=False)
+        self.assertEqual(sequential._build_stack, batch._build_stack)
+        self.assertEqual(sequential._deploy_stack, batch._deploy_stack)
+        self.assertEqual(sequential.get_resources(), batch.get_resources())
+        self.assertEqual(len(plan), len(result['built']) + len(result['skipped']))
+        self.assertIn((("FF", [13, 2]), "Location is blocked."), result['skipped'])
+
+        short = copy.deepcopy(game)
+        short._player_resources[0]['MP'] = 2.5
+        sequential = copy.deepcopy(short)
+        spawned = sequential.attempt_spawn("PI", [13, 0], 5)
+        result = short.attempt_build([("PI", [13, 0], 5)], stop_when_unaffordable=False)
+        self.assertEqual(2, spawned)
+        self.assertEqual([("PI", [13, 0], spawned)], result['built'], "Mobile units should be deployed as far as MP allows")
+        self.assertEqual(sequential._deploy_stack, short._deploy_stack)
+        self.assertEqual(sequential.get_resources(), short.get_resources())
+        all_or_none = copy.deepcopy(game)
+        all_or_none._player_resources[0]['MP'] = 2.5
+        self.assertEqual([], all_or_none.attempt_build([("PI", [13, 0], 5)])['built'], "Stopping plans deploy all units or none")
+
+        prefix = game.attempt_build(plan)
+        first_unaffordable = [item for item, reason in prefix['skipped'] if reason == "Not enough resources."]
+        self.assertEqual(1, len(first_unaffordable), "Only the first unaffordable item should be tried")
+        self.assertTrue(all(plan.index(item) < plan.index(first_unaffordable[0]) for item in prefix['built']))
+
+    def test_serialization(self):
+        config = self.make_turn_0_map().config
+        turn = {"p2Units": [[[3, 14, 40.0, "1"]], [], [[13, 16, 60.0, "2"]], [], [], [], [[3, 14, 0, "3"]], []], "turnInfo": [0, 7, -1],
+                "p1Stats": [28.0, 12.5, 7.3, 1500], "p1Units": [[[13, 2, 20.0, "4"]], [], [[14, 2, 12.0, "5"]], [], [], [], [], [[13, 2, 0, "6"]]],
+                "p2Stats": [30.0, 9.0, 4.0, 900], "events": {}}
+        game = GameState(config, turn)
+        game.suppress_warnings(True)
+        game.attempt_spawn("PI", [13, 0], 2)
+        game.attempt_spawn("FF", [12, 2])
+        game.attempt_remove([14, 2])
+
+        data = serialization.encode(game)
+        copy_state = serialization.decode(config, data)
+        self.assertLess(len(data), 1024)
+        self.assertEqual(data, serialization.encode(copy_state))
+        self.assertEqual((game.turn_number, game.my_health, game.enemy_time), (copy_state.turn_number, copy_state.my_health, copy_state.enemy_time))
+        self.assertEqual(game.get_resources(1), copy_state.get_resources(1))
+        self.assertEqual(game._build_stack, copy_state._build_stack)
+        self.assertEqual(game._deploy_stack, copy_state._deploy_stack)
+        self.assertTrue(copy_state.game_map[13, 2][0].upgraded)
+        self.assertTrue(copy_state.game_map[3, 14][0].pending_removal)
+        self.assertEqual(game.game_map.threat, copy_state.game_map.threat)
+        self.assertEqual(game.find_path_to_edge([13, 0]), copy_state.find_path_to_edge([13, 0]))
+        self.assertEqual(game.game_map[13, 0][0].target_edge, copy_state.game_map[13, 0][0].target_edge)
+
+    def test_project_resources(self):
+        game = self.make_turn_0_map()
+        plans = [[0, k] for k in range(6)] + [[10, 0]]
+        table = game.project_resources(4, plans)
+        self.assertEqual((2, len(plans), 5), (len(table), len(table[0]), len(table[0][0])))
+        for k in range(5):
+            self.assertEqual([25.0, 5.0 - k], table[0][k][0])
+            for turns in range(1, 5):
+                self.assertEqual(game.project_future_MP(turns, 0, 5.0 - k), table[0][k][turns][1])
+        self.assertEqual([30.0, 5.0], table[0][5][1], "Spending every MP leaves only the next turn's income")
+        self.assertEqual([15.0 + 4 * 5.0, game.project_future_MP(4, 1)], table[1][6][4])
+
+    def test_target_rings(self):
+        game = self.make_turn_0_map()
+        rings = game_map.rings_in_range((13, 13), 2.5, 0.01)
+        self.assertEqual([(13, 13)], list(rings[0]))
+        self.assertEqual(sorted(game_map.locations_in_range((13, 13), 2.5, 0.01)), sorted(location for ring in rings for location in ring))
+
+        scout = GameUnit("PI", game.config, 0, None, 13, 13)
+        game.game_map.add_unit("FF", [13, 14], 1)
+        game.game_map.add_unit("FF", [12, 14], 1)
+        self.assertIs(game.game_map[13, 14][0], game.get_target(scout), "The nearest structure should be targeted")
+        game.game_map.add_unit("PI", [14, 15], 1)
+        self.assertIs(game.game_map[14, 15][0], game.get_target(scout), "Mobile units should be preferred over nearer structures")
+        game.game_map.add_unit("PI", [12, 15], 1)
+        self.assertIs(game.game_map[12, 15][0], game.get_target(scout), "Units further from the center column should win ties")
+        game.game_map[14, 15][0].health = 1
+        self.assertIs(game.game_map[14, 15][0], game.get_target(scout), "Within a ring the lowest health should be targeted")
+        game.game_map.add_unit("PI", [14, 15], 1)
+        game.game_map[14, 15][1].health = 1
+        self.assertIs(game.game_map[14, 15][0], game.get_target(scout), "Exact ties should go to the first unit found")
+
+    def test_background_precompute(self):
+        def warm(task, game):
+            game.find_path_to_edge([13, 0])
+            return game
+        prepared = self.make_turn_0_map()
+        task = BackgroundTask(warm, prepared)
+        self.assertIs(prepared, task.result(timeout=5))
+
+        game = GameState(prepared.config, prepared.serialized_string)
+        game.reuse_caches(prepared)
+        misses = game._path_cache.misses
+        self.assertEqual(prepared.find_path_to_edge([13, 0]), game.find_path_to_edge([13, 0]))
+        self.assertEqual(misses, game._path_cache.misses, "The path should come from the precomputed cache")
+
+        def stop_early(task):
+            while not task.cancelled():
+                pass
+            return "finished"
+        task = BackgroundTask(stop_early)
+        self.assertIsNone(task.result(), "An unfinished task should not return a result")
+        task.cancel()
+        self.assertIsNone(task.result(timeout=5))
+        self.assertTrue(task.done())
+
+        core = AlgoCore()
+        self.assertTrue(core._frame_settled({"p1Units": [[[1, 13, 60, "1"]], [], [], [], [], [], []], "p2Units": [[]] * 7}, ""))
+        self.assertFalse(core._frame_settled({"p1Units": [[]] * 7}, json.dumps({"p2Units": [[], [], [], [[13, 27, 15, "9"]], [], [], []]})))
+        self.assertTrue(core._frame_settled({"p2Units": [[]] * 7}, json.dumps({"turnInfo": [1, 3, 2, 40]})), "A missing unit list should count as empty")
+        self.assertFalse(core._frame_settled({"p1Units": None}, json.dumps({"p1Units": [[], [], [], [], [[2, 11, 30, "4"]], [], []]})))
+
+    def test_selective_frame_decoding(self):
+        frame = {"p2Units": [[], [[3, 14, 30, "2"]], [], [], [], [], []], "turnInfo": [1, 4, 12], "p1Stats": [30.0, 1.0, 2.0, 100],
+                 "p1Units": [[[13, 2, 60, "1"]], [], [], [], [], [], []], "p2Stats": [30.0, 1.0, 2.0, 100],
+                 "events": {"selfDestruct": [], "breach": [[[5, 8], 1, 3, "7", 2]], "spawn": []}}
+        message = json.dumps(frame, indent=1)
+        self.assertEqual(frame["p2Units"], decode_section(message, "p2Units"))
+        self.assertEqual(frame["events"]["breach"], decode_section(message, "breach", "events"))
+        self.assertIsNone(decode_section(message, "melee"))
+
+        core = AlgoCore()
+        self.assertEqual(frame, core._decode_frame(message))
+        core.action_frame_sections = ("events.breach", "p2Units")
+        self.assertEqual({"turnInfo": [1, 4, 12], "events": {"breach": frame["events"]["breach"]}, "p2Units": frame["p2Units"]},
+                         core._decode_frame(message))
+
+        decoy = {"note": "{\"breach\": 1 }", "breach": ["top level"], "spawn": "\"spawn\":", "p2Units": [[]] * 7, "turnInfo": [1, 4, 12],
+                 "events": {"move": [[[1, 2], "{"]], "breach": frame["events"]["breach"], "spawn": []}}
+        for decoy_message in (json.dumps(decoy), json.dumps(decoy).replace("\\\"", "'")):
+            self.assertEqual(frame["events"]["breach"], decode_section(decoy_message, "breach", "events"), "Keys should only be searched inside their parent")
+            self.assertEqual(["top level"], decode_section(decoy_message, "breach"))
+            self.assertEqual([], decode_section(decoy_message, "spawn", "events"))
+        self.assertIsNone(decode_section(json.dumps({"breach": []}), "breach", "events"))
+
+        partial = core._decode_frame(message)
+        self.assertTrue(core._frame_settled(partial, message))
+        events = partial["events"]
+        completed = core._complete_frame(partial, message)
+        self.assertEqual(frame, completed)
+        self.assertIs(events["breach"], completed["events"]["breach"], "Sections already decoded should be reused")
+
+    def test_turn_budget(self):
+        config = self.make_turn_0_map().config
+        turn_budget = budget.TurnBudget(config, safety=0.5)
+        self.assertEqual(config["timingAndReplay"]["waitTimeBotSoft"] / 1000, turn_budget.soft_limit)
+        self.assertEqual(budget.DEFAULT_SOFT_LIMIT / 1000, budget.TurnBudget().soft_limit)
+        turn_budget.soft_limit = 4
+        deadline = turn_budget.start_turn(0)
+        self.assertAlmostEqual(2, deadline.budget)
+        self.assertLessEqual(deadline.slice(priority=budget.LOW).end, deadline.slice().end)
+        self.assertLessEqual(deadline.slice().end, deadline.slice(priority=budget.CRITICAL).end)
+        self.assertEqual(deadline.end, deadline.slice(priority=budget.CRITICAL).end)
+        self.assertLessEqual(deadline.slice(seconds=0.01).remaining(), 0.01)
+        self.assertTrue(budget.TimeSlice(0).expired())
+        self.assertFalse(deadline.expired())
+
+        turn_budget.end_turn()
+        deadline = turn_budget.start_turn(500)
+        self.assertAlmostEqual(0.5, turn_budget.overhead, places=2, msg="Time the engine saw but the algo did not should be held back")
+        self.assertAlmostEqual(1.5, deadline.budget, places=2)
+        turn_budget.end_turn()
+        turn_budget.start_turn(0)
+        self.assertAlmostEqual(0.5, turn_budget.overhead, places=2, msg="The largest recent overhead should be kept")
+
+    def test_buffered_log(self):
+        stream = io.StringIO()
+        log = logger.Logger(level=logger.INFO, ring_level=logger.DEBUG, ring_size=3, stream=stream)
+        formatted = []
+        class Probe:
+            def __format__(self, spec):
+                formatted.append(spec)
+                return "probe"
+        log.debug("detail {}", Probe())
+        log.info("turn {}", 4)
+        self.assertEqual("", stream.getvalue(), "Nothing should be written before the flush")
+        log.flush()
+        self.assertEqual("turn 4\n", stream.getvalue())
+        self.assertEqual([], formatted, "Disabled messages should never be formatted")
+
+        quiet = logger.Logger(level=logger.ERROR, ring_level=logger.ERROR, stream=stream)
+        quiet.debug("dropped {}", Probe())
+        self.assertFalse(quiet.enabled(logger.WARNING))
+        self.assertEqual(0, len(quiet._ring))
+
+        for frame in range(5):
+            log.debug("frame {}", frame)
+        stream.truncate(0)
+        stream.seek(0)
+        log.dump_recent("ValueError()")
+        self.assertEqual(["---------------- Recent debug log: ValueError() ----------------", "DEBUG frame 2", "DEBUG frame 3", "DEBUG frame 4"],
+                         stream.getvalue().splitlines())
+
+    def test_worker_pool(self):
+        game = self.make_turn_0_map()
+        game.game_map.add_unit("DF", [13, 12], 0)
+        game.attempt_spawn("PI", [13, 0])
+        pool = WorkerPool(game.config, 2)
+        try:
+            pool.update(game)
+            encoded = serialization.encode(game)
+            self.assertEqual([encoded] * 3, pool.map(serialization.encode, [()] * 3), "Every worker should hold the state sent to it")
+            self.assertEqual([None], pool.map(serialization.encode, [(1,)]), "A failed task should give None")
+            pool.map(serialization.encode, [(), ()], budget.TimeSlice(0))
+            self.assertEqual([encoded, None], pool.map(serialization.encode, [(), (1,)]), "Late results of an earlier call should be dropped")
+
+            pool.map(_slow_task, [(0.2,)] * 20, budget.TimeSlice(0.05))
+            started = time.perf_counter()
+            pool.update(game)
+            self.assertEqual([encoded, encoded], pool.map(serialization.encode, [(), ()]))
+            self.assertLess(time.perf_counter() - started, 1, "Abandoned tasks should be skipped rather than delay the next call")
+        finally:
+            processes = pool._processes
+            pool.close()
+        self.assertFalse(any(process.is_alive() for process in processes))
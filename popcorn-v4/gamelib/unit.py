@@ -1,5 +1,161 @@
+import weakref
+from operator import attrgetter
+
+
+class UnitStats:
+    """The stats shared by every unit of one type, before or after upgrading
+
+    Records are built once per config and type by UnitRegistry.stats, and shared by every GameUnit using them.
+    They should be treated as read only.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * registry (UnitRegistry): The registry that built the record, kept alive by it
+        * stationary (bool): Whether or not units of this type are structures
+        * speed, damage_f, damage_i, attackRange, shieldRange, max_health, shieldPerUnit, shieldBonusPerY, cost:
+          See GameUnit
+
+    """
+    __slots__ = ("config", "registry", "stationary", "speed", "damage_f", "damage_i", "attackRange", "shieldRange",
+                 "max_health", "shieldPerUnit", "shieldBonusPerY", "cost")
+
+    def __init__(self, registry, type_config, base=None):
+        """Reads the stats of a unit type from its config entry
+
+        Args:
+            registry (UnitRegistry): The registry of the config the type belongs to
+            type_config (dict): The unitInformation entry of the type, or its upgrade entry
+            base (UnitStats): The stats before upgrading when type_config is an upgrade entry
+
+        """
+        self.config = registry.config
+        self.registry = registry
+        if base is None:
+            self.stationary = type_config["unitCategory"] == 0
+            self.speed = type_config.get("speed", 0)
+            self.damage_f = type_config.get("attackDamageTower", 0)
+            self.damage_i = type_config.get("attackDamageWalker", 0)
+            self.attackRange = type_config.get("attackRange", 0)
+            self.shieldRange = type_config.get("shieldRange", 0)
+            self.max_health = type_config.get("startHealth", 0)
+            self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
+            self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
+            self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
+        else:
+            self.stationary = base.stationary
+            self.speed = type_config.get("speed", base.speed)
+            self.damage_f = type_config.get("attackDamageTower", base.damage_f)
+            self.damage_i = type_config.get("attackDamageWalker", base.damage_i)
+            self.attackRange = type_config.get("attackRange", base.attackRange)
+            self.shieldRange = type_config.get("shieldRange", base.shieldRange)
+            self.max_health = type_config.get("startHealth", base.max_health)
+            self.shieldPerUnit = type_config.get("shieldPerUnit", base.shieldPerUnit)
+            self.shieldBonusPerY = type_config.get("shieldBonusPerY", base.shieldBonusPerY)
+            self.cost = [type_config.get("cost1", 0) + base.cost[0], type_config.get("cost2", 0) + base.cost[1]]
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class UnitRegistry:
+    """The unit types of one config, resolved once and shared by everything built from that config
+
+    Get the registry of a config with UnitRegistry.for_config. Nothing in it changes after it is built,
+    so several configs can be used side by side in one process. A registry lives as long as a GameState
+    or GameUnit using it, then it is dropped from the cache along with its config.
+
+    Attributes :
+        * config (JSON): Contains information about the game
+        * WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE (str): The shorthand of each unit type
+        * UNIT_TYPE_TO_INDEX (dict): Maps a shorthand to its integer type id, its index in the config's unitInformation
+        * ALL_UNITS (tuple): The shorthands of every deployable unit
+        * STRUCTURE_TYPES (tuple): The shorthands of the structures
+        * is_structure (tuple): Per type id, True if the type is a structure
+
+    """
+    __slots__ = ("config", "WALL", "SUPPORT", "TURRET", "SCOUT", "DEMOLISHER", "INTERCEPTOR", "REMOVE", "UPGRADE",
+                 "UNIT_TYPE_TO_INDEX", "ALL_UNITS", "STRUCTURE_TYPES", "is_structure", "_stats", "__weakref__")
+
+    # Registries keyed by id(config), held weakly so they do not outlive their users.
+    # Each registry keeps its config, so a reused id is never mistaken for it
+    _by_config = weakref.WeakValueDictionary()
+
+    @classmethod
+    def for_config(cls, config):
+        """Gets the registry of a config, building it the first time
+
+        Args:
+            config (JSON): Contains information about the game
+
+        Returns:
+            The same UnitRegistry for every call with the same config object
+
+        """
+        registry = cls._by_config.get(id(config))
+        if registry is None or registry.config is not config:
+            registry = cls(config)
+            cls._by_config[id(config)] = registry
+        return registry
+
+    def __init__(self, config):
+        self.config = config
+        unit_information = config["unitInformation"]
+        (self.WALL, self.SUPPORT, self.TURRET, self.SCOUT, self.DEMOLISHER, self.INTERCEPTOR,
+         self.REMOVE, self.UPGRADE) = [unit_information[i]["shorthand"] for i in range(8)]
+        self.UNIT_TYPE_TO_INDEX = {type_config["shorthand"]: i for i, type_config in enumerate(unit_information)}
+        self.ALL_UNITS = (self.SCOUT, self.DEMOLISHER, self.INTERCEPTOR, self.WALL, self.SUPPORT, self.TURRET)
+        self.STRUCTURE_TYPES = (self.WALL, self.SUPPORT, self.TURRET)
+        self.is_structure = tuple(type_config["shorthand"] in self.STRUCTURE_TYPES for type_config in unit_information)
+        self._stats = {}
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def is_stationary(self, unit_type):
+        """
+            Args:
+                unit_type: A unit type
+
+            Returns:
+                Boolean, True if the unit is stationary, False otherwise.
+        """
+        index = self.UNIT_TYPE_TO_INDEX.get(unit_type)
+        return index is not None and self.is_structure[index]
+
+    def stats(self, unit_type, upgraded=False):
+        """Gets the shared stats record of a unit type
+
+        Args:
+            unit_type: The shorthand of the unit type
+            upgraded: If True get the stats after upgrading
+
+        Returns:
+            A UnitStats record, the same object for every call with the same arguments
+
+        """
+        key = (unit_type, upgraded)
+        stats = self._stats.get(key)
+        if stats is None:
+            type_config = self.config["unitInformation"][self.UNIT_TYPE_TO_INDEX[unit_type]]
+            if upgraded:
+                stats = UnitStats(self, type_config.get("upgrade", {}), self.stats(unit_type))
+            else:
+                stats = UnitStats(self, type_config)
+            self._stats[key] = stats
+        return stats
+
+
 class GameUnit:
-    """Holds information about a Unit. 
+    """Holds information about a Unit.
+
+    Only the fields that change during a game are stored on the unit. Its stats are read from a
+    UnitStats record shared by every unit of the same type and upgrade state.
 
     Attributes :
         * unit_type (string): This unit's type
@@ -21,19 +177,33 @@ class GameUnit:
         * upgraded (boolean): If this unit is upgraded
 
     """
+    __slots__ = ("unit_type", "stats", "player_index", "pending_removal", "upgraded", "x", "y", "health",
+                 "shield", "supported_by", "target_edge", "frames_until_move", "path", "active")
+
+    config = property(attrgetter("stats.config"))
+    stationary = property(attrgetter("stats.stationary"))
+    speed = property(attrgetter("stats.speed"))
+    damage_f = property(attrgetter("stats.damage_f"))
+    damage_i = property(attrgetter("stats.damage_i"))
+    attackRange = property(attrgetter("stats.attackRange"))
+    shieldRange = property(attrgetter("stats.shieldRange"))
+    max_health = property(attrgetter("stats.max_health"))
+    shieldPerUnit = property(attrgetter("stats.shieldPerUnit"))
+    shieldBonusPerY = property(attrgetter("stats.shieldBonusPerY"))
+    cost = property(attrgetter("stats.cost"))
+
     def __init__(self, unit_type, config, player_index=None, health=None, x=-1, y=-1, target_edge=None):
         """ Initialize unit variables using args passed
 
         """
         self.unit_type = unit_type
-        self.config = config
+        self.stats = UnitRegistry.for_config(config).stats(unit_type)
         self.player_index = player_index
         self.pending_removal = False
         self.upgraded = False
         self.x = x
         self.y = y
-        self.__serialize_type()
-        self.health = self.max_health if not health else health
+        self.health = self.stats.max_health if not health else health
         self.shield = 0 # should be 0 to start, right? or am i trippin
         self.supported_by = []
         self.target_edge = target_edge
@@ -41,36 +211,10 @@ class GameUnit:
         self.path = []
         self.active = True
 
-    def __serialize_type(self):
-        from .game_state import STRUCTURE_TYPES, UNIT_TYPE_TO_INDEX, SUPPORT
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]]
-        self.stationary = type_config["unitCategory"] == 0
-        self.speed = type_config.get("speed", 0)
-        self.damage_f = type_config.get("attackDamageTower", 0)
-        self.damage_i = type_config.get("attackDamageWalker", 0)
-        self.attackRange = type_config.get("attackRange", 0)
-        self.shieldRange = type_config.get("shieldRange", 0)
-        self.max_health = type_config.get("startHealth", 0)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", 0)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", 0)
-        self.cost = [type_config.get("cost1", 0), type_config.get("cost2", 0)]
-
-
     def upgrade(self):
-        from .game_state import UNIT_TYPE_TO_INDEX
-        type_config = self.config["unitInformation"][UNIT_TYPE_TO_INDEX[self.unit_type]].get("upgrade", {})
-        self.speed = type_config.get("speed", self.speed)
-        self.damage_f = type_config.get("attackDamageTower", self.damage_f)
-        self.damage_i = type_config.get("attackDamageWalker", self.damage_i)
-        self.attackRange = type_config.get("attackRange", self.attackRange)
-        self.shieldRange = type_config.get("shieldRange", self.shieldRange)
-        self.max_health = type_config.get("startHealth", self.max_health)
-        self.shieldPerUnit = type_config.get("shieldPerUnit", self.shieldPerUnit)
-        self.shieldBonusPerY = type_config.get("shieldBonusPerY", self.shieldBonusPerY)
-        self.cost = [type_config.get("cost1", 0) + self.cost[0], type_config.get("cost2", 0) + self.cost[1]]
+        self.stats = UnitRegistry.for_config(self.stats.config).stats(self.unit_type, True)
         self.upgraded = True
 
-
     def __toString(self):
         owner = "Friendly" if self.player_index == 0 else "Enemy"
         removal = ", pending removal" if self.pending_removal else ""
@@ -81,4 +225,3 @@ class GameUnit:
 
     def __repr__(self):
         return self.__toString()
-
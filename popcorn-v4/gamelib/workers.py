@@ -0,0 +1,137 @@
+"""
+A pool of worker processes started before the first turn, for evaluating work in parallel.
+
+Starting a process and importing gamelib takes far longer than a turn can spare, so the workers
+are started once when the config arrives and kept for the whole game. Each worker loads the config,
+imports the modules the algo names and builds the unit tables up front. Every turn the pool sends
+the game state to each worker once as the compact encoding from serialization.py. Tasks sent after
+that only carry a function and its arguments. Tasks left queued when a call runs out of time or a new
+turn starts are skipped by the workers, so they never delay the next turn. See AlgoCore.worker_count.
+"""
+
+import importlib
+import itertools
+import multiprocessing
+import queue
+
+from . import serialization
+from .unit import UnitRegistry
+from .util import debug_write
+
+_STATE = "state"
+_TASK = "task"
+
+
+def _worker_main(config, imports, tasks, results, generation):
+    for name in imports:
+        importlib.import_module(name)
+    UnitRegistry.for_config(config)
+    game_state = None
+    while True:
+        message = tasks.get()
+        if message is None:
+            return
+        kind, payload = message
+        if kind == _STATE:
+            game_state = serialization.decode(config, payload)
+            continue
+        task_id, task_generation, function, args = payload
+        # The pool moved on since this task was queued, nobody is waiting for its result
+        if task_generation != generation.value:
+            continue
+        try:
+            results.put((task_id, function(game_state, *args), None))
+        except Exception as error:
+            results.put((task_id, None, repr(error)))
+
+
+class WorkerPool:
+    """A fixed number of worker processes sharing the state of the current turn
+
+    Functions run by the pool are called as function(game_state, *args) in a worker, where game_state is
+    the state last passed to update. They must be defined at the top level of a module so they can be sent
+    to the workers, and should copy game_state before changing it since later tasks on the worker share it.
+
+    Attributes :
+        * size (int): The number of workers
+
+    """
+    def __init__(self, config, size, imports=()):
+        """Starts the workers, which import their modules while the caller carries on
+
+        Args:
+            config (JSON): Contains information about the game
+            size: The number of worker processes
+            imports: Names of modules each worker imports before its first task, such as ("simulator",)
+
+        """
+        self.size = size
+        self._results = multiprocessing.Queue()
+        self._tasks = [multiprocessing.Queue() for _ in range(size)]
+        self._task_ids = itertools.count()
+        # Only tasks queued under the current generation are run, bumping it abandons everything queued
+        self._generation = multiprocessing.RawValue("q", 0)
+        self._processes = [multiprocessing.Process(target=_worker_main, args=(config, tuple(imports), tasks, self._results, self._generation), daemon=True)
+                           for tasks in self._tasks]
+        for process in self._processes:
+            process.start()
+
+    def update(self, game_state):
+        """Sends a game state to every worker, the state later tasks run against
+
+        Tasks still queued from earlier turns are skipped.
+
+        Args:
+            game_state: The GameState of the turn, usually the one passed to on_turn
+
+        """
+        self._generation.value += 1
+        encoded = serialization.encode(game_state)
+        for tasks in self._tasks:
+            tasks.put((_STATE, encoded))
+
+    def map(self, function, args_list, time_slice=None):
+        """Runs a function once per entry of args_list, spread over the workers
+
+        Args:
+            function: A top level function called as function(game_state, *args)
+            args_list: A list of argument tuples
+            time_slice: A gamelib.TimeSlice to stop waiting at, or None to wait for every result
+
+        Returns:
+            The results in the order of args_list. Entries whose task failed or did not finish in time are None.
+
+        """
+        self._generation.value += 1
+        generation = self._generation.value
+        pending = {}
+        for index, args in enumerate(args_list):
+            task_id = next(self._task_ids)
+            pending[task_id] = index
+            self._tasks[index % self.size].put((_TASK, (task_id, generation, function, tuple(args))))
+
+        results = [None] * len(args_list)
+        while pending:
+            try:
+                task_id, result, error = self._results.get(timeout=None if time_slice is None else time_slice.remaining())
+            except queue.Empty:
+                # Abandon the tasks that have not started, the workers skip them
+                self._generation.value += 1
+                break
+            # Results of tasks from an earlier call that ran out of time are dropped
+            if task_id not in pending:
+                continue
+            if error is not None:
+                debug_write("Worker task failed: {}".format(error))
+            results[pending.pop(task_id)] = result
+        return results
+
+    def close(self, timeout=1):
+        """Stops the workers, terminating any still busy after timeout seconds"""
+        for tasks in self._tasks:
+            tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._processes = []
@@ -1,6 +1,5 @@
 import gamelib, copy, time
 from gamelib.game_map import GameMap
-from gamelib.game_state import is_stationary
 from gamelib.util import time_this
 import math
 import time
@@ -19,16 +18,18 @@ def calculate_shield_bonus(support):
 
     return y * support.shieldBonusPerY
 
-def simulate_multiple(current_state, strategies, info, opt):
+def simulate_multiple(current_state, strategies, info, opt, time_slice=None):
     # here, strategies are functions that modify the current state to produce simulatable attacks.
     # info should be a datastructure expected by the strategy functions, perhaps communicating relevant past patterns and such
     # opt is the optimizer to be used to analyze the strategies and their results - it can return anything
+    # time_slice is the gamelib.TimeSlice to finish in, usually from the turn deadline. without one we allow 4 seconds
 
     results = []
 
     s = None
 
-    t1 = time.perf_counter()
+    if time_slice is None:
+        time_slice = gamelib.TimeSlice(4)
 
     for strategy in strategies:
 
@@ -40,8 +41,8 @@ def simulate_multiple(current_state, strategies, info, opt):
             s.reset(sim_state)
         results.append(s.simulate())
 
-        # if we've spent more than 4 seconds simulating, don't attempt to simulate any more
-        if time.perf_counter() - t1 > 4:
+        # if our slice of the turn is used up, don't attempt to simulate any more
+        if time_slice.expired():
 
             break
     
@@ -65,24 +66,10 @@ class Simulator():
 
         self.edges = game_state.game_map.get_edges()
 
-        self.pathfinder = gamelib.navigation.ShortestPathFinder()
-
-        global WALL, SUPPORT, TURRET, SCOUT, DEMOLISHER, INTERCEPTOR, REMOVE, UPGRADE, STRUCTURE_TYPES, ALL_UNITS, UNIT_TYPE_TO_INDEX
-        UNIT_TYPE_TO_INDEX = {}
-        WALL = self.game_state.config["unitInformation"][0]["shorthand"]
-        UNIT_TYPE_TO_INDEX[WALL] = 0
-        SUPPORT = self.game_state.config["unitInformation"][1]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SUPPORT] = 1
-        TURRET = self.game_state.config["unitInformation"][2]["shorthand"]
-        UNIT_TYPE_TO_INDEX[TURRET] = 2
-        SCOUT = self.game_state.config["unitInformation"][3]["shorthand"]
-        UNIT_TYPE_TO_INDEX[SCOUT] = 3
-        DEMOLISHER = self.game_state.config["unitInformation"][4]["shorthand"]
-        UNIT_TYPE_TO_INDEX[DEMOLISHER] = 4
-        INTERCEPTOR = self.game_state.config["unitInformation"][5]["shorthand"]
-        UNIT_TYPE_TO_INDEX[INTERCEPTOR] = 5
-
-        self.can_attack = [TURRET, SCOUT, DEMOLISHER, INTERCEPTOR]
+
+        self.registry = gamelib.unit.UnitRegistry.for_config(self.game_state.config)
+
+        self.can_attack = [self.registry.TURRET, self.registry.SCOUT, self.registry.DEMOLISHER, self.registry.INTERCEPTOR]
 
         self.reset(game_state)
 
@@ -95,13 +82,19 @@ class Simulator():
 
         self.units = []
 
-        for cell in self.game_state.game_map:
+        grid = self.game_state.game_map.get_map()
+
+        for x, y in gamelib.game_map.ALL_LOCATIONS:
+
+            self.units += grid[x][y]
 
-            self.units += self.game_state.game_map[cell]
+        self.pathfinder = gamelib.navigation.DynamicPathFinder(self.game_state.game_map.blocked_mask)
 
         self.enemy_health_damage = 0
         self.friendly_health_damage = 0
 
+        WALL, SUPPORT, TURRET = self.registry.WALL, self.registry.SUPPORT, self.registry.TURRET
+        SCOUT, DEMOLISHER, INTERCEPTOR = self.registry.SCOUT, self.registry.DEMOLISHER, self.registry.INTERCEPTOR
         self.enemy_units_destroyed = {WALL: 0, TURRET: 0, SUPPORT: 0, SCOUT: 0, DEMOLISHER: 0, INTERCEPTOR: 0}
         self.enemy_upgraded_units_destroyed = {WALL: 0, TURRET: 0, SUPPORT: 0, SCOUT: 0, DEMOLISHER: 0, INTERCEPTOR: 0}
         self.friendly_units_destroyed = {WALL: 0, TURRET: 0, SUPPORT: 0, SCOUT: 0, DEMOLISHER: 0, INTERCEPTOR: 0}
@@ -142,7 +135,7 @@ class Simulator():
 
         for unit in self.units:
 
-            if is_stationary(unit.unit_type) or not unit.active:
+            if unit.stationary or not unit.active:
 
                 continue
 
@@ -158,7 +151,7 @@ class Simulator():
 
                 #gamelib.debug_write(f"pathfinding for edge {unit.target_edge} for {unit}")
 
-                path = self.pathfinder.navigate_multiple_endpoints_faster([unit.x, unit.y], self.edges[unit.target_edge], self.game_state, self.units)
+                path = self.pathfinder.navigate([unit.x, unit.y], unit.target_edge)
                 #gamelib.debug_write(f"{path}")
                 unit.path = path
                 cache[k] = path
@@ -168,7 +161,7 @@ class Simulator():
 
         for unit in self.units:
 
-            if is_stationary(unit.unit_type) or not unit.active:
+            if unit.stationary or not unit.active:
                 
                 continue
 
@@ -179,7 +172,7 @@ class Simulator():
 
             if unit.path == [[unit.x, unit.y]] or unit.path == []:
 
-                if [unit.x, unit.y] in self.edges[unit.target_edge]:
+                if gamelib.game_map.EDGE_OF[unit.x * 28 + unit.y] == unit.target_edge:
 
                     if unit.player_index == 0:
 
@@ -238,10 +231,10 @@ class Simulator():
 
             else:
 
-                if is_stationary(unit.unit_type):
+                if unit.stationary:
 
                     targets = self.units_in_range(unit, self.units, unit.attackRange, 
-                                                  f=lambda x: x.player_index != unit.player_index and x.active and x.health > 0 and not is_stationary(x.unit_type))
+                                                  f=lambda x: x.player_index != unit.player_index and x.active and x.health > 0 and not x.stationary)
 
                 else:
                     
@@ -269,13 +262,13 @@ class Simulator():
 
         for unit in self.units:
 
-            if unit.unit_type != SUPPORT:
+            if unit.unit_type != self.registry.SUPPORT:
 
                 continue
             
             # very nice little filter idea here haha, saves some time
             targets = self.units_in_range(unit, self.units, unit.shieldRange, 
-                                          f=lambda x: (x.player_index == unit.player_index) and (not is_stationary(x.unit_type)) and (unit not in x.supported_by) and x.active)
+                                          f=lambda x: (x.player_index == unit.player_index) and (not x.stationary) and (unit not in x.supported_by) and x.active)
 
             for target in targets:
 
@@ -292,7 +285,7 @@ class Simulator():
         r = 1.5
 
         # this is config-dependent
-        if unit.unit_type == INTERCEPTOR:
+        if unit.unit_type == self.registry.INTERCEPTOR:
             r = 9
 
         targets = self.units_in_range(unit, self.units, r, f=lambda x: x.player_index != unit.player_index and x.active)
@@ -308,7 +301,7 @@ class Simulator():
 
     def handle_attack(self, attacker, target):
 
-        if is_stationary(target.unit_type):
+        if target.stationary:
 
             self.damage_unit(target, attacker.damage_f)
             
@@ -332,7 +325,7 @@ class Simulator():
 
                 n.append(unit)
 
-                if not is_stationary(unit.unit_type):
+                if not unit.stationary:
 
                     self.mobile_units_remain = True
 
@@ -340,9 +333,10 @@ class Simulator():
 
                 continue
             
-            if is_stationary(unit.unit_type):
+            if unit.stationary:
 
                 stationary_units_destroyed = True
+                self.pathfinder.unblock([unit.x, unit.y])
 
             if not unit.active: 
                 
@@ -412,7 +406,7 @@ class Simulator():
                 break
             if frame_count % 10 == 0:
                 #gamelib.debug_write(f"simulating frame {frame_count}")
-                gamelib.debug_write(f"{stationary_units_destroyed=}, {self.mobile_units_remain=}")
+                gamelib.log.debug("stationary_units_destroyed={}, self.mobile_units_remain={}", stationary_units_destroyed, self.mobile_units_remain)
 
             if stationary_units_destroyed:
                 #gamelib.debug_write("pathfinding")
@@ -446,7 +440,7 @@ class Simulator():
                 self.removal_needed = False
             #gamelib.debug_write(f"{stationary_units_destroyed=}, {self.mobile_units_remain=}")
             frame_count += 1
-        gamelib.debug_write(f"{frame_count} frames simulated")
+        gamelib.log.debug("{} frames simulated", frame_count)
 
         return {'times': t, 
                 'friendly_score': self.enemy_health_damage,